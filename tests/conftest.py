@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Спільне для тестів: модулі xef_* лежать у корені репозиторію"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
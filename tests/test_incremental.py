@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Тести інкрементального збереження з маніфестом (save_to_files)"""
+
+import json
+
+from xef_benchmark import generate_xef
+from xef_extractor import MANIFEST_NAME, XEFExtractor
+
+
+def extract(xef_file, output_dir, only=None):
+    extractor = XEFExtractor(xef_file, quiet=True, only=only)
+    assert extractor.parse() and extractor.extract_all()
+    return extractor.save_to_files(output_dir, incremental=True)
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    generate_xef(xef_file, fb=3, programs=2, global_vars=5, variables=2, st_lines=3)
+    first = extract(xef_file, tmp_path / 'out')
+    assert first['written'] > 0
+
+    program = tmp_path / 'out' / 'Programs' / 'SR_000000.st'
+    mtime = program.stat().st_mtime_ns
+    assert extract(xef_file, tmp_path / 'out') == {
+        'written': 0, 'skipped': first['written'], 'deleted': 0}
+    assert program.stat().st_mtime_ns == mtime
+
+
+def test_removed_units_are_deleted(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    output_dir = tmp_path / 'out'
+    generate_xef(xef_file, fb=3, programs=2, variables=2, st_lines=3)
+    extract(xef_file, output_dir)
+    assert (output_dir / 'FunctionBlocks' / 'FB_000002.st').is_file()
+
+    generate_xef(xef_file, fb=2, programs=2, variables=2, st_lines=3)
+    stats = extract(xef_file, output_dir)
+    assert stats['deleted'] == 1
+    assert not (output_dir / 'FunctionBlocks' / 'FB_000002.st').exists()
+    manifest = json.loads((output_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    assert 'FunctionBlocks/FB_000002.st' not in manifest
+    assert 'FunctionBlocks/FB_000001.st' in manifest
+
+
+def test_partial_extraction_keeps_other_units(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    output_dir = tmp_path / 'out'
+    generate_xef(xef_file, fb=2, programs=2, variables=2, st_lines=3)
+    extract(xef_file, output_dir)
+
+    stats = extract(xef_file, output_dir, only=['program:SR_000001'])
+    assert stats['deleted'] == 0
+    assert (output_dir / 'FunctionBlocks' / 'FB_000000.st').is_file()
+    manifest = json.loads((output_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    assert 'FunctionBlocks/FB_000000.st' in manifest
+
+
+def test_filtered_globals_do_not_replace_full_table(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    output_dir = tmp_path / 'out'
+    generate_xef(xef_file, programs=1, global_vars=3, variables=2, st_lines=3)
+    extract(xef_file, output_dir)
+    full_st = output_dir / 'Variables' / 'VAR_GLOBAL.st'
+    full = full_st.read_text(encoding='utf-8')
+    manifest = json.loads((output_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+
+    stats = extract(xef_file, output_dir, only=['var:G_0000001'])
+    assert stats['deleted'] == 0
+    assert full_st.read_text(encoding='utf-8') == full
+    selected = (output_dir / 'Variables' / 'VAR_GLOBAL_SELECTED.st').read_text(encoding='utf-8')
+    assert 'G_0000001' in selected and 'G_0000002' not in selected
+    new_manifest = json.loads((output_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    for name in ('Variables/VAR_GLOBAL.st', 'Variables/GLOBAL_VARIABLES.csv'):
+        assert new_manifest[name] == manifest[name]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Тести метрик екстракції (Metrics)"""
+
+from xef_benchmark import generate_xef
+from xef_extractor import Metrics, XEFExtractor
+from xef_parallel import ParallelExtractor
+
+
+def unit_types(extractor_class, xef_file, **kwargs):
+    metrics = Metrics()
+    extractor = extractor_class(xef_file, quiet=True, metrics=metrics, **kwargs)
+    assert extractor.parse() and extractor.extract_all()
+    return {tag: (entry['count'], entry['variables'])
+            for tag, entry in metrics.unit_types.items()}
+
+
+def test_unit_peak_does_not_lower_phase_peak():
+    metrics = Metrics(trace_memory=True)
+    with metrics.phase('extract'):
+        started = metrics.unit_started()
+        data = bytearray(1 << 20)
+        del data
+        metrics.unit_finished('FBSource', started, None)
+        metrics.unit_finished('FBSource', metrics.unit_started(), None)
+    assert metrics.phases['extract']['peak_traced_bytes'] >= 1 << 20
+
+
+def test_content_header_is_counted(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    generate_xef(xef_file, fb=2, programs=1, global_vars=3, variables=2, st_lines=1)
+    assert unit_types(XEFExtractor, xef_file, streaming=True)['contentHeader'] == (1, 0)
+
+
+def test_parallel_metrics_match_sequential(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    generate_xef(xef_file, fb=6, programs=4, global_vars=5, variables=2, st_lines=2)
+    assert (unit_types(ParallelExtractor, xef_file, jobs=2)
+            == unit_types(XEFExtractor, xef_file, streaming=True))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Тести стабільних імен проектів (xef_batch.project_names)"""
+
+from xef_batch import claim_output_dir, output_owner, project_names
+from xef_benchmark import generate_xef
+from xef_index import connect, import_project, index_owner
+
+
+def make_inputs(tmp_path, *dirs):
+    inputs = []
+    for name in dirs:
+        xef_file = tmp_path / name / 'unitpro.xef'
+        xef_file.parent.mkdir(parents=True)
+        xef_file.write_text('', encoding='utf-8')
+        inputs.append(xef_file)
+    return inputs
+
+
+def test_output_dir_does_not_depend_on_other_inputs(tmp_path):
+    d1, d2 = make_inputs(tmp_path, 'd1', 'd2')
+    output_root = tmp_path / 'out'
+    for inputs in ([d1, d2], [d2], [d1], [d2, d1]):
+        names = project_names(inputs, output_owner(output_root))
+        for path, name in names.items():
+            claim_output_dir(output_root / f"{name}_extracted", path)
+        assert names == {path: {d1: 'unitpro', d2: 'd2_unitpro'}[path] for path in inputs}
+
+
+def test_new_file_does_not_take_claimed_name(tmp_path):
+    d1, d2 = make_inputs(tmp_path, 'd1', 'd2')
+    output_root = tmp_path / 'out'
+    claim_output_dir(output_root / 'unitpro_extracted', d2)
+    assert project_names([d1], output_owner(output_root)) == {d1: 'd1_unitpro'}
+
+
+def test_index_project_name_is_stable(tmp_path):
+    d1, d2 = make_inputs(tmp_path, 'd1', 'd2')
+    for path in (d1, d2):
+        generate_xef(path, fb=1, programs=1, variables=1, st_lines=1)
+    conn = connect(str(tmp_path / 'index.db'))
+    for inputs in ([d1, d2], [d2], [d1]):
+        for path, name in project_names(inputs, index_owner(conn)).items():
+            import_project(conn, path, name)
+    projects = dict(conn.execute("SELECT name, file FROM projects"))
+    assert projects == {'unitpro': str(d1.resolve()), 'd2_unitpro': str(d2.resolve())}
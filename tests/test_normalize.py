@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Тести нормалізатора XEF (xef_normalize)"""
+
+import io
+import zipfile
+
+from xef_normalize import main, normalize, normalize_file
+
+
+XEF = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<FEFExchangeFile>
+<fileHeader product="Control Expert" dateTime="date_and_time#2024-1-14-15:13:24" company="S"></fileHeader>
+<dataBlock><variables typeName="INT" name="X" guid="{8A3F-12bc}">
+<attribute name="TypeCodeCheckSumString" value="4F2A"></attribute>
+<hexValue>0A1B2C</hexValue>
+<comment>a &amp; b &lt; c</comment></variables></dataBlock>
+<STSource><![CDATA[x := y < z;]]></STSource>
+<!-- коментар -->
+</FEFExchangeFile>
+"""
+
+
+def run(text):
+    out = io.StringIO()
+    zeroed = normalize(io.BytesIO(text.encode('utf-8')), out)
+    return out.getvalue(), zeroed
+
+
+def test_volatile_values_are_zeroed():
+    result, zeroed = run(XEF)
+    assert 'dateTime="date_and_time#0-0-0-0:0:0"' in result
+    assert 'guid="{0-0}"' in result
+    assert '<attribute name="TypeCodeCheckSumString" value="0">' in result
+    assert '<hexValue></hexValue>' in result
+    assert zeroed == 4
+
+
+def test_attributes_are_sorted_and_content_kept():
+    result, _ = run(XEF)
+    assert '<variables guid="{0-0}" name="X" typeName="INT">' in result
+    assert '<comment>a &amp; b &lt; c</comment>' in result
+    assert '<![CDATA[x := y < z;]]>' in result
+    assert '<!-- коментар -->' in result
+
+
+def test_normalize_is_idempotent():
+    once, _ = run(XEF)
+    twice, zeroed = run(once)
+    assert twice == once
+    assert zeroed == 0
+
+
+def test_same_project_saved_at_different_times_is_identical():
+    later = XEF.replace('2024-1-14-15:13:24', '2024-12-9-9:05:59').replace('4F2A', '0019')
+    assert run(later)[0] == run(XEF)[0]
+
+
+def test_normalize_file_reads_zef_and_check_mode(tmp_path):
+    zef_file = tmp_path / 'p.zef'
+    with zipfile.ZipFile(zef_file, 'w') as archive:
+        archive.writestr('unitpro.xef', XEF)
+    xef_file = tmp_path / 'p.xef'
+    assert normalize_file(zef_file, xef_file) == 4
+    assert xef_file.read_text(encoding='utf-8') == run(XEF)[0]
+
+    assert main(['--check', str(xef_file)]) == 0
+    raw_file = tmp_path / 'raw.xef'
+    raw_file.write_text(XEF, encoding='utf-8')
+    assert main(['--check', str(raw_file)]) == 1
+    assert main(['--in-place', str(zef_file)]) == 2
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Тести побайтового сканера блоків і паралельної екстракції (xef_parallel)"""
+
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from xef_benchmark import generate_xef
+from xef_extractor import XEFExtractor
+from xef_parallel import ParallelExtractor, make_batches, scan_blocks, xml_declaration
+
+
+def blocks(data, tags=('FBSource', 'program')):
+    return [(tag, data[start:end]) for tag, start, end in scan_blocks(data, tags, b'R')]
+
+
+def test_scan_blocks_finds_full_and_self_closing_blocks():
+    data = b'<R><FBSource a="1"/><program x="2"><a/>p</program></R>'
+    assert blocks(data) == [('FBSource', b'<FBSource a="1"/>'),
+                            ('program', b'<program x="2"><a/>p</program>')]
+
+
+def test_scan_blocks_skips_comments_and_cdata():
+    data = (b'<R><!-- <FBSource>x</FBSource> --><![CDATA[<program>]]>'
+            b'<program>p</program></R>')
+    assert blocks(data) == [('program', b'<program>p</program>')]
+
+
+def test_scan_blocks_ignores_tags_with_same_prefix():
+    data = b'<R><FBSourceX>q</FBSourceX><FBSource\n>f</FBSource></R>'
+    assert blocks(data) == [('FBSource', b'<FBSource\n>f</FBSource>')]
+
+
+def test_scan_blocks_reports_unclosed_block():
+    with pytest.raises(ET.ParseError):
+        scan_blocks(b'<R><program>p</R>', ['program'], b'R')
+
+
+def test_scan_blocks_requires_root_element():
+    with pytest.raises(ET.ParseError):
+        scan_blocks(b'hello world', ['program'])
+    with pytest.raises(ET.ParseError):
+        scan_blocks(b'<!-- <FEFExchangeFile> --><program>p</program>', ['program'])
+
+
+def test_scan_blocks_requires_root_close_after_last_block():
+    data = b'<FEFExchangeFile><program>p</program>'
+    with pytest.raises(ET.ParseError):
+        scan_blocks(data, ['program'])
+    assert len(scan_blocks(data + b'\n</FEFExchangeFile>\n', ['program'])) == 1
+
+
+def test_xml_declaration():
+    assert xml_declaration(b'<?xml version="1.0"?>\n<R/>') == b'<?xml version="1.0"?>'
+    assert xml_declaration(b'<R/>') == b''
+
+
+def test_make_batches_keeps_file_order():
+    blocks = [('program', i * 10, i * 10 + 10) for i in range(100)]
+    batches = make_batches(blocks, 4)
+    assert [block for batch in batches for block in batch] == blocks
+
+
+def test_parallel_output_matches_sequential(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    generate_xef(xef_file, fb=5, ddt=3, ef=2, dfb=2, programs=4, global_vars=20,
+                 variables=3, st_lines=5)
+
+    sequential = XEFExtractor(xef_file, quiet=True)
+    assert sequential.parse() and sequential.extract_all()
+    parallel = ParallelExtractor(xef_file, jobs=2, quiet=True)
+    assert parallel.parse() and parallel.extract_all()
+    assert list(parallel.iter_rendered_files()) == list(sequential.iter_rendered_files())
+
+
+def test_truncated_file_fails_like_sequential(tmp_path):
+    xef_file = tmp_path / 'p.xef'
+    generate_xef(xef_file, fb=3, programs=2, variables=2, st_lines=3)
+    data = xef_file.read_bytes()
+    # Обрізати одразу після закриття блоку: блоки цілі, кореня немає
+    xef_file.write_bytes(data[:data.rindex(b'</FBSource>') + len(b'</FBSource>')])
+
+    assert not XEFExtractor(xef_file, quiet=True).parse()
+    parallel = ParallelExtractor(xef_file, jobs=2, quiet=True)
+    assert not parallel.parse()
+    assert parallel.error
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Тести сканера ST коду (xef_xref.scan_st)"""
+
+from xef_xref import scan_st, tokenize_st
+
+
+def test_assignment_target_is_write():
+    assert scan_st("x := a + b;") == [('x', 1, 'write'), ('a', 1, 'read'), ('b', 1, 'read')]
+
+
+def test_comparison_is_not_assignment():
+    assert scan_st("IF x = 1 THEN y := x; END_IF;") == [
+        ('x', 1, 'read'), ('y', 1, 'write'), ('x', 1, 'read')]
+
+
+def test_call_formal_parameters_and_outputs():
+    usages = scan_st("tmr(IN := start, PT := t#5s, Q => done);")
+    assert usages == [('tmr', 1, 'call'), ('start', 1, 'read'), ('done', 1, 'write')]
+
+
+def test_structure_field_and_index_use_base_variable():
+    assert scan_st("y.z[i] := Fn(k);") == [
+        ('y', 1, 'write'), ('i', 1, 'read'), ('Fn', 1, 'call'), ('k', 1, 'read')]
+
+
+def test_comments_and_strings_are_skipped_but_count_lines():
+    code = "(* c := d\n*) s := 'q := r'; // e := f\n/* g */ h := 1;"
+    assert scan_st(code) == [('s', 2, 'write'), ('h', 3, 'write')]
+
+
+def test_keywords_are_not_identifiers():
+    usages = scan_st("FOR i := 0 TO n DO\n  sum := sum + i;\nEND_FOR;")
+    assert ('FOR', 1, 'read') not in usages
+    assert usages == [('i', 1, 'write'), ('n', 1, 'read'),
+                      ('sum', 2, 'write'), ('sum', 2, 'read'), ('i', 2, 'read')]
+
+
+def test_tokenizer_literals():
+    kinds = [(kind, value) for kind, value, _ in tokenize_st("16#FF 1.5e3 T#2s %MW10 'a$'b'")]
+    assert kinds == [('number', '16#FF'), ('number', '1.5e3'), ('typed', 'T#2s'),
+                     ('address', '%MW10'), ('string', "'a$'b'")]
+
+
+XEF = """<?xml version="1.0" encoding="UTF-8"?>
+<FEFExchangeFile>
+<FBSource nameOfFBType="Valve" version="0.01">
+<privateLocalVariables><variables name="tmr" typeName="TON"></variables></privateLocalVariables>
+<FBProgram name="Main"><STSource>tmr(IN := G_Run);
+Out := Valve(tmr.Q);</STSource></FBProgram>
+</FBSource>
+<dataBlock><variables name="G_Run" typeName="BOOL"></variables></dataBlock>
+</FEFExchangeFile>
+"""
+
+
+def test_cross_reference_resolves_local_global_and_unit(tmp_path):
+    from xef_extractor import XEFExtractor
+    from xef_xref import CrossReference
+
+    xef_file = tmp_path / 'p.xef'
+    xef_file.write_text(XEF, encoding='utf-8')
+    extractor = XEFExtractor(xef_file, quiet=True)
+    assert extractor.parse() and extractor.extract_all()
+    xref = CrossReference(extractor.extracted_data)
+
+    rows = {(row[0], row[7]): row[1:3] for row in xref.iter_rows()}
+    assert rows[('tmr', 'call')] == ('FBSource:Valve', 'TON')
+    assert rows[('G_Run', 'read')] == ('dataBlock', 'BOOL')
+    assert rows[('Valve', 'call')] == ('FBSource:Valve', 'FBSource')
+    assert rows[('Out', 'write')] == ('', '')
+    # Виклик FB за іменем типу не є викликом екземпляра
+    assert [row[0] for row in xref.iter_instance_calls()] == ['tmr']
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+XEF Parser Backends - Бекенди парсингу XML для XEFExtractor
+etree (стандартна бібліотека), lxml (якщо встановлено) та expat SAX
+"""
+
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+# Розмір блоку читання для потокового парсингу
+CHUNK_SIZE = 1 << 16
+
+# Теги, які читають вбудовані обробники XEFExtractor. SAX бекенд будує
+# всередині блоків тільки їх, решта піддерев (графіка LD/FBD тощо) пропускається.
+EXTRACTED_FIELDS = frozenset((
+    'comment', 'inputParameters', 'outputParameters', 'inOutParameters',
+    'privateLocalVariables', 'publicLocalVariables', 'FBProgram',
+    'STSource', 'SFCSource', 'LDSource', 'structure', 'ExternalToolsOnly',
+    'identProgram', 'variables', 'variableInit',
+))
+
+# Теги, текст яких потрібен обробникам
+TEXT_FIELDS = frozenset(('comment', 'STSource'))
+
+
+class ParseSpec:
+    """Що потрібно від парсера
+
+    top_tags - теги блоків верхнього рівня, які треба віддати;
+    accept(tag, attrib) - додаткова перевірка блоку на його початку;
+    child_tags - блок -> тег дочірніх елементів, що віддаються по одному
+    (наприклад dataBlock -> variables);
+    fields - блок -> множина тегів, які треба будувати всередині блоку
+    (відсутній ключ - будувати все). Використовується SAX бекендом.
+    """
+
+    def __init__(self, top_tags, child_tags=None, fields=None, accept=None):
+        self.top_tags = frozenset(top_tags)
+        self.child_tags = dict(child_tags or {})
+        self.fields = dict(fields or {})
+        # Додаткова перевірка блоку за атрибутами (фільтр за ім'ям)
+        self._accept = accept
+
+    def accept(self, tag, attrib):
+        """Чи потрібен блок верхнього рівня (викликається на його початку)"""
+        if tag not in self.top_tags:
+            return False
+        return self._accept is None or self._accept(tag, attrib)
+
+
+def _iter_blocks(events, spec, release):
+    """Спільний автомат iterparse для ElementTreeBackend і LxmlBackend
+
+    events - події ('start'/'end', елемент); release(батько, елемент)
+    звільняє оброблений елемент з піддеревом. Віддає (тег блоку, елемент),
+    як iter_elements.
+    """
+    root = None
+    top = None
+    wanted = False
+    child_tag = None
+    depth = 0
+    for event, elem in events:
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+            elif depth == 2:
+                top = elem
+                wanted = spec.accept(elem.tag, elem.attrib)
+                child_tag = spec.child_tags.get(elem.tag) if wanted else None
+            continue
+
+        depth -= 1
+        if depth == 2:
+            if not wanted:
+                # Непотрібний блок: не накопичувати його піддерево
+                top.clear()
+            elif child_tag is not None and elem.tag == child_tag:
+                yield top.tag, elem
+                # Блок не накопичує оброблені дочірні елементи
+                release(top, elem)
+        elif depth == 1:
+            if wanted:
+                yield None, elem
+            release(root, elem)
+            top = child_tag = None
+            wanted = False
+
+
+def _etree_release(parent, elem):
+    # Оброблений елемент - єдиний дочірній у батька: clear() батька
+    # звільняє його разом з піддеревом
+    parent.clear()
+
+
+class ElementTreeBackend:
+    """Стандартна бібліотека: xml.etree.ElementTree (без залежностей)"""
+
+    name = 'etree'
+
+    def parse(self, source, spec):
+        """Побудувати повне дерево, повернути кореневий елемент"""
+        return ET.parse(source).getroot()
+
+    def iter_elements(self, source, spec):
+        """Потоково віддавати (тег блоку, елемент)
+
+        Для блоків верхнього рівня тег блоку None; для дочірніх елементів
+        з spec.child_tags - тег їхнього блоку. Після обробки елемент
+        звільняється, тому пам'ять обмежена найбільшим блоком. Непотрібні
+        блоки iterparse все одно будує - вони лише звільняються по ходу.
+        """
+        yield from _iter_blocks(ET.iterparse(source, events=('start', 'end')), spec,
+                                _etree_release)
+
+
+def _lxml_release(parent, elem):
+    elem.clear()
+    parent.remove(elem)
+
+
+class LxmlBackend:
+    """lxml: iterparse з huge_tree (без обмеження глибини і розміру тексту)"""
+
+    name = 'lxml'
+
+    def __init__(self):
+        if lxml_etree is None:
+            raise ValueError("бекенд lxml недоступний: пакет lxml не встановлено")
+
+    def parse(self, source, spec):
+        """Побудувати повне дерево, повернути кореневий елемент"""
+        parser = lxml_etree.XMLParser(huge_tree=True)
+        try:
+            return lxml_etree.parse(source, parser).getroot()
+        except lxml_etree.XMLSyntaxError as e:
+            raise ET.ParseError(str(e)) from e
+
+    def iter_elements(self, source, spec):
+        """Потоково віддавати (тег блоку, елемент) - див. ElementTreeBackend"""
+        # Без фільтра тегів: події для всіх елементів потрібні, щоб звільняти
+        # і непотрібні блоки, інакше вони накопичуються під коренем
+        context = lxml_etree.iterparse(source, events=('start', 'end'), huge_tree=True)
+        try:
+            yield from _iter_blocks(context, spec, _lxml_release)
+        except lxml_etree.XMLSyntaxError as e:
+            raise ET.ParseError(str(e)) from e
+
+
+class _PrunedTreeBuilder:
+    """Обробник подій expat, що будує тільки потрібні елементи
+
+    Непотрібні блоки та поля пропускаються повністю - для них не
+    створюються елементи і не збирається текст. У потоковому режимі
+    блоки верхнього рівня і потокові дочірні елементи не приєднуються
+    до батька, а віддаються через ready.
+    """
+
+    def __init__(self, spec, streaming):
+        self.spec = spec
+        self.streaming = streaming
+        self.root = None
+        self.stack = []
+        self.depth = 0
+        self.skip = 0          # глибина всередині пропущеного піддерева
+        self.block = None      # тег поточного блоку верхнього рівня
+        self.fields = None     # поля поточного блоку (None - всі)
+        self.text = []
+        self.keep_text = False
+        self.ready = []
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.skip:
+            self.skip += 1
+            return
+
+        if self.depth == 1:
+            self.root = ET.Element(tag, attrib)
+            self.stack.append(self.root)
+            return
+        if self.depth == 2:
+            if tag not in self.spec.top_tags or not self.spec.accept(tag, attrib):
+                self.skip = 1
+                return
+            self.block = tag
+            self.fields = self.spec.fields.get(tag)
+        elif self.fields is not None and tag not in self.fields:
+            self.skip = 1
+            return
+
+        self._flush_text()
+        elem = ET.Element(tag, attrib)
+        if not (self.streaming and self._is_streamed(tag)):
+            self.stack[-1].append(elem)
+        self.stack.append(elem)
+        self.keep_text = self.fields is None or tag in TEXT_FIELDS
+
+    def end(self, tag):
+        depth = self.depth
+        self.depth -= 1
+        if self.skip:
+            self.skip -= 1
+            return
+
+        self._flush_text()
+        elem = self.stack.pop()
+        # Текст після дочірнього елемента (tail) обробникам не потрібен
+        self.keep_text = False
+        if not self.streaming:
+            return
+        if depth == 2:
+            self.ready.append((None, elem))
+            self.block = self.fields = None
+        elif depth == 3 and self.spec.child_tags.get(self.block) == tag:
+            self.ready.append((self.block, elem))
+
+    def data(self, text):
+        if self.keep_text and not self.skip:
+            self.text.append(text)
+
+    def _is_streamed(self, tag):
+        """Чи віддається елемент окремо (не приєднується до батька)"""
+        return self.depth == 2 or (
+            self.depth == 3 and self.spec.child_tags.get(self.block) == tag)
+
+    def _flush_text(self):
+        if self.text:
+            elem = self.stack[-1]
+            if elem.text is None and not len(elem):
+                elem.text = ''.join(self.text)
+            self.text = []
+
+
+class ExpatBackend:
+    """Чистий expat SAX: будує тільки поля, які читає екстрактор"""
+
+    name = 'expat'
+
+    def _run(self, source, builder):
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = builder.start
+        parser.EndElementHandler = builder.end
+        parser.CharacterDataHandler = builder.data
+        try:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                parser.Parse(chunk, not chunk)
+                yield
+                if not chunk:
+                    break
+        except expat.ExpatError as e:
+            raise ET.ParseError(str(e)) from e
+
+    def parse(self, source, spec):
+        """Побудувати обрізане за spec дерево, повернути кореневий елемент"""
+        builder = _PrunedTreeBuilder(spec, streaming=False)
+        for _ in self._run(source, builder):
+            pass
+        return builder.root
+
+    def iter_elements(self, source, spec):
+        """Потоково віддавати (тег блоку, елемент) - див. ElementTreeBackend"""
+        builder = _PrunedTreeBuilder(spec, streaming=True)
+        for _ in self._run(source, builder):
+            ready, builder.ready = builder.ready, []
+            for item in ready:
+                yield item
+
+
+BACKENDS = {
+    'etree': ElementTreeBackend,
+    'lxml': LxmlBackend,
+    'expat': ExpatBackend,
+}
+
+
+# Бекенд за замовчуванням. lxml парсить швидше, але обробники читають
+# елементи lxml повільніше, і в сумі etree швидший (xef_benchmark.py run)
+DEFAULT_BACKEND = 'etree'
+
+
+def get_backend(name=DEFAULT_BACKEND):
+    """Створити бекенд за назвою"""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"невідомий бекенд парсера: {name}") from None
+    return backend_class()
+
+
+def add_backend_argument(parser):
+    """Додати опцію --backend до argparse парсера"""
+    parser.add_argument('--backend', choices=tuple(BACKENDS), default=DEFAULT_BACKEND,
+                        help=f"бекенд парсера: {', '.join(BACKENDS)} "
+                             f"(за замовчуванням {DEFAULT_BACKEND})")
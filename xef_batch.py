@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XEF Batch Extractor - Паралельна екстракція багатьох XEF/ZEF проектів
+Кожен проект обробляється в окремому процесі пулу, в кінці друкується звіт
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from xef_backends import DEFAULT_BACKEND, add_backend_argument
+from xef_extractor import ContentStore, Metrics, XEFExtractor
+
+
+INPUT_SUFFIXES = ('.xef', '.zef')
+
+
+def find_inputs(paths):
+    """Зібрати XEF/ZEF файли зі списку файлів і каталогів (без повторів)"""
+    inputs = []
+    seen = set()
+    for path in map(Path, paths):
+        if path.is_dir():
+            found = sorted(
+                p for p in path.iterdir()
+                if p.is_file() and p.suffix.lower() in INPUT_SUFFIXES
+            )
+        else:
+            found = [path]
+        for p in found:
+            key = p.resolve()
+            if key not in seen:
+                seen.add(key)
+                inputs.append(p)
+    return inputs
+
+
+# Файл у папці результатів з абсолютним шляхом вхідного файлу, з якого
+# вона створена: за ним папка залишається за тим самим проектом між запусками
+SOURCE_MARKER = '.xef_source'
+
+
+def name_candidates(path):
+    """Можливі імена проекту від найкоротшого: unitpro, d1_unitpro, data_d1_unitpro, ..."""
+    path = Path(path)
+    parents = [p.name for p in path.resolve().parents if p.name]
+    yield path.stem
+    for depth in range(1, len(parents) + 1):
+        yield '_'.join(parents[:depth][::-1] + [path.stem])
+
+
+def project_names(inputs, owner):
+    """Імена проектів для вхідних файлів: {шлях: ім'я}
+
+    owner(ім'я) повертає абсолютний шлях файлу, якому ім'я вже належить
+    (з попередніх запусків), або None, якщо ім'я вільне. Файл, що вже має
+    ім'я, зберігає його незалежно від інших файлів у запуску; новий
+    отримує перше вільне з name_candidates. Імена порівнюються без
+    урахування регістру (Windows). ValueError, якщо вільного імені немає.
+    """
+    resolved = {path: str(Path(path).resolve()) for path in inputs}
+    names = {}
+    taken = set()
+    for path in inputs:
+        for name in name_candidates(path):
+            if name.lower() not in taken and owner(name) == resolved[path]:
+                names[path] = name
+                taken.add(name.lower())
+                break
+    for path in inputs:
+        if path in names:
+            continue
+        for name in name_candidates(path):
+            if name.lower() not in taken and owner(name) is None:
+                names[path] = name
+                taken.add(name.lower())
+                break
+        else:
+            raise ValueError(f"немає вільного імені проекту для {path}")
+    return names
+
+
+def output_owner(output_root):
+    """owner для project_names за SOURCE_MARKER у папках <ім'я>_extracted
+
+    Папка без позначки (створена до її появи) вважається вільною.
+    """
+    def owner(name):
+        try:
+            with open(Path(output_root) / f"{name}_extracted" / SOURCE_MARKER,
+                      encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+    return owner
+
+
+def claim_output_dir(output_dir, xef_file):
+    """Створити папку результатів і записати в неї SOURCE_MARKER"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / SOURCE_MARKER, 'w', encoding='utf-8') as f:
+        f.write(f"{Path(xef_file).resolve()}\n")
+
+
+def extract_project(xef_file, output_dir, streaming=False, incremental=False, backend=DEFAULT_BACKEND,
+                    store_dir=None):
+    """Витягти один проект (виконується у процесі пулу)"""
+    started = time.perf_counter()
+    result = {
+        'file': str(xef_file),
+        'output_dir': str(output_dir),
+        'ok': False,
+        'error': '',
+        'units': 0,
+        'stored': 0,
+    }
+    metrics = Metrics()
+    store = ContentStore(store_dir) if store_dir else None
+    try:
+        # quiet: вивід з різних процесів перемішався б і коштує часу
+        extractor = XEFExtractor(xef_file, streaming=streaming, quiet=True, metrics=metrics,
+                                 backend=backend)
+        if extractor.parse() and extractor.extract_all():
+            extractor.save_to_files(output_dir, incremental=incremental, store=store)
+            data = extractor.extracted_data
+            result['units'] = sum(len(data[key]) for key in (
+                'fb_sources', 'ddt_sources', 'ef_sources', 'dfb_sources', 'programs'))
+            result['ok'] = True
+            if store is not None:
+                result['stored'] = store.stored
+        else:
+            result['error'] = extractor.error or 'помилка екстракції'
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - started
+    result['metrics'] = metrics.to_dict()
+    return result
+
+
+def print_summary(results, elapsed):
+    """Надрукувати підсумок по всіх проектах"""
+    print("\n" + "=" * 60)
+    print("  ПІДСУМОК")
+    print("=" * 60)
+    for result in sorted(results, key=lambda r: r['file']):
+        status = "✓" if result['ok'] else "✗"
+        print(f"  {status} {result['seconds']:8.2f} с  {result['units']:6d} юн.  {result['file']}")
+
+    failed = [r for r in results if not r['ok']]
+    if failed:
+        print("\n❌ Помилки:")
+        for result in failed:
+            print(f"  {result['file']}: {result['error']}")
+
+    print(f"\n✅ Успішно: {len(results) - len(failed)}  ❌ Помилок: {len(failed)}"
+          f"  ⏱ Загальний час: {elapsed:.2f} с")
+
+
+def main():
+    """Головна функція"""
+    parser = argparse.ArgumentParser(
+        description="Паралельна екстракція XEF/ZEF проектів")
+    parser.add_argument('inputs', nargs='+',
+                        help="XEF/ZEF файли або каталоги з ними")
+    parser.add_argument('-o', '--output-root', default='.',
+                        help="каталог для результатів (<ім'я>_extracted у ньому)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="кількість процесів (за замовчуванням - кількість ядер)")
+    parser.add_argument('--stream', action='store_true',
+                        help="потоковий режим (iterparse) для великих файлів")
+    add_backend_argument(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help="записувати тільки змінені файли, видаляти зниклі")
+    parser.add_argument('--store', metavar='DIR',
+                        help="спільне сховище FB/DDT/EF/DFB: однакові блоки різних проектів "
+                             "зберігаються один раз і стають жорсткими посиланнями")
+    parser.add_argument('--metrics', metavar='JSON',
+                        help="записати результати і метрики всіх проектів у JSON файл")
+    args = parser.parse_args()
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print("✗ XEF/ZEF файли не знайдено")
+        sys.exit(1)
+
+    output_root = Path(args.output_root)
+    try:
+        names = project_names(inputs, output_owner(output_root))
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    for xef_file in inputs:
+        claim_output_dir(output_root / f"{names[xef_file]}_extracted", xef_file)
+
+    print(f"📄 Проектів: {len(inputs)}, процесів: {args.jobs}")
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [
+            pool.submit(extract_project, str(xef_file),
+                        str(output_root / f"{names[xef_file]}_extracted"),
+                        args.stream, args.incremental, args.backend, args.store)
+            for xef_file in inputs
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = "✓" if result['ok'] else "✗"
+            print(f"  {status} {Path(result['file']).name} ({result['seconds']:.2f} с)")
+
+    elapsed = time.perf_counter() - started
+    print_summary(results, elapsed)
+    if args.store:
+        print(f"📦 Сховище {args.store}: нових блоків {sum(r['stored'] for r in results)}")
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            json.dump({'seconds': elapsed, 'jobs': args.jobs, 'projects': results},
+                      f, indent=2, ensure_ascii=False)
+    if any(not r['ok'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
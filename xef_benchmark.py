@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XEF Benchmark - Генератор синтетичних XEF файлів і вимірювання швидкодії
+Час кожної фази та пікова пам'ять (RSS) записуються у JSON для порівняння версій
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from xef_extractor import XEFExtractor, peak_rss_kb
+
+
+SIZE_UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+# Кількість юнітів кожного типу в одному "блоці" генератора
+DEFAULT_MIX = {
+    'fb': 10,
+    'ddt': 5,
+    'ef': 2,
+    'dfb': 2,
+    'programs': 5,
+    'global_vars': 50,
+}
+
+# Фази повного режиму: назва -> метод XEFExtractor
+TREE_PHASES = (
+    ('extract_project_info', 'extract_project_info'),
+    ('extract_fb_sources', 'extract_fb_sources'),
+    ('extract_ddt_sources', 'extract_ddt_sources'),
+    ('extract_ef_sources', 'extract_ef_sources'),
+    ('extract_dfb_sources', 'extract_dfb_sources'),
+    ('extract_programs', 'extract_programs'),
+    ('extract_variables', 'extract_variables'),
+)
+
+
+def parse_size(text):
+    """'10MB' -> 10485760"""
+    text = text.strip().upper()
+    for suffix, factor in SIZE_UNITS.items():
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def format_size(size):
+    """10485760 -> '10MB'"""
+    for suffix, factor in sorted(SIZE_UNITS.items(), key=lambda item: -item[1]):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return str(size)
+
+
+# ---------------------------------------------------------------------------
+# Генератор
+# ---------------------------------------------------------------------------
+
+def _variables(prefix, count, types=('BOOL', 'INT', 'REAL', 'TIME')):
+    """Список <variables> для секції параметрів"""
+    return ''.join(
+        f'<variables name="{prefix}_{i}" typeName="{types[i % len(types)]}">'
+        f'<comment>{prefix} {i}</comment></variables>\n'
+        for i in range(count)
+    )
+
+
+def _st_body(index, lines, variables):
+    """Синтетичне ST тіло заданої довжини"""
+    body = []
+    for n in range(lines):
+        v = n % max(variables, 1)
+        if n % 4 == 0:
+            body.append(f"IF Cnt_{index} &lt; {n} THEN Out_{v} := In_{v} AND NOT Priv_{v}; END_IF;")
+        elif n % 4 == 1:
+            body.append(f"tmr_{v}(IN := In_{v}, PT := t#{n % 60}s);")
+        elif n % 4 == 2:
+            body.append(f"Cnt_{index} := Cnt_{index} + {n}; (* line {n} *)")
+        else:
+            body.append(f"Pub_{v} := tmr_{v}.Q OR Out_{v};")
+    return '\n'.join(body)
+
+
+def _fb_source(i, variables, st_lines):
+    return (
+        f'<FBSource nameOfFBType="FB_{i:06d}" version="0.{i % 100:02d}" '
+        f'dateTime="dt#2024-01-01-00:00:00">\n'
+        f'<comment>Synthetic FB {i}</comment>\n'
+        f'<inputParameters>\n{_variables("In", variables)}</inputParameters>\n'
+        f'<outputParameters>\n{_variables("Out", variables)}</outputParameters>\n'
+        f'<privateLocalVariables>\n{_variables("Priv", variables)}</privateLocalVariables>\n'
+        f'<publicLocalVariables>\n{_variables("Pub", variables)}</publicLocalVariables>\n'
+        f'<FBProgram name="Main"><STSource>{_st_body(i, st_lines, variables)}</STSource></FBProgram>\n'
+        f'</FBSource>\n'
+    )
+
+
+def _ddt_source(i, variables):
+    return (
+        f'<DDTSource DDTName="T_{i:06d}" version="0.01" dateTime="dt#2024-01-01-00:00:00">\n'
+        f'<comment>Synthetic DDT {i}</comment>\n'
+        f'<structure>\n{_variables("Field", variables)}</structure>\n'
+        f'</DDTSource>\n'
+    )
+
+
+def _ef_source(i, variables):
+    return (
+        f'<EFSource nameOfEFType="EF_{i:06d}" version="1.0">\n'
+        f'<ExternalToolsOnly>\n'
+        f'<inputParameters>\n{_variables("In", variables)}</inputParameters>\n'
+        f'<outputParameters>\n{_variables("Out", 1)}</outputParameters>\n'
+        f'</ExternalToolsOnly>\n'
+        f'</EFSource>\n'
+    )
+
+
+def _dfb_source(i, st_lines):
+    return (
+        f'<DFBSource nameOfDFBType="DFB_{i:06d}" version="1.0">\n'
+        f'<comment>Synthetic DFB {i}</comment>\n'
+        f'<STSource>{_st_body(i, st_lines, 8)}</STSource>\n'
+        f'</DFBSource>\n'
+    )
+
+
+def _program(i, st_lines):
+    return (
+        f'<program>\n'
+        f'<identProgram name="SR_{i:06d}" type="section" task="MAST" SectionOrder="{i}"></identProgram>\n'
+        f'<comment>Synthetic section {i}</comment>\n'
+        f'<STSource>{_st_body(i, st_lines, 16)}</STSource>\n'
+        f'</program>\n'
+    )
+
+
+def _global_variable(i):
+    return (
+        f'<variables name="G_{i:07d}" typeName="{("BOOL", "INT", "T_000000")[i % 3]}" '
+        f'topologicalAddress="%MW{i}"><comment>Global {i}</comment></variables>\n'
+    )
+
+
+def generate_xef(path, fb=0, ddt=0, ef=0, dfb=0, programs=0, global_vars=0,
+                 variables=8, st_lines=40):
+    """Записати синтетичний XEF файл
+
+    Файл пишеться потоком, тому розмір не обмежений пам'яттю.
+    Повертає кількість записаних байт.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<FEFExchangeFile>\n')
+        f.write('<fileHeader company="Schneider Automation" product="Synthetic" '
+                'dateTime="date_and_time#2024-1-1-00:00:00" DTDVersion="41"></fileHeader>\n')
+        f.write('<contentHeader name="BENCH" version="0.0.1"></contentHeader>\n')
+        for i in range(ddt):
+            f.write(_ddt_source(i, variables))
+        for i in range(fb):
+            f.write(_fb_source(i, variables, st_lines))
+        for i in range(ef):
+            f.write(_ef_source(i, variables))
+        for i in range(dfb):
+            f.write(_dfb_source(i, st_lines))
+        for i in range(programs):
+            f.write(_program(i, st_lines))
+        if global_vars:
+            f.write('<dataBlock>\n')
+            for i in range(global_vars):
+                f.write(_global_variable(i))
+            f.write('</dataBlock>\n')
+        f.write('</FEFExchangeFile>\n')
+    return os.path.getsize(path)
+
+
+def counts_for_size(target_bytes, variables=8, st_lines=40, mix=None):
+    """Підібрати кількість юнітів для файлу приблизно заданого розміру"""
+    mix = mix or DEFAULT_MIX
+    block = (
+        sum(len(_fb_source(0, variables, st_lines)) for _ in range(mix['fb']))
+        + sum(len(_ddt_source(0, variables)) for _ in range(mix['ddt']))
+        + sum(len(_ef_source(0, variables)) for _ in range(mix['ef']))
+        + sum(len(_dfb_source(0, st_lines)) for _ in range(mix['dfb']))
+        + sum(len(_program(0, st_lines)) for _ in range(mix['programs']))
+        + sum(len(_global_variable(0)) for _ in range(mix['global_vars']))
+    )
+    blocks = max(1, math.ceil(target_bytes / block))
+    return {kind: count * blocks for kind, count in mix.items()}
+
+
+# ---------------------------------------------------------------------------
+# Вимірювання
+# ---------------------------------------------------------------------------
+
+def _timed(phases, name, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    phases[name] = time.perf_counter() - started
+    return result
+
+
+def run_case(xef_file, streaming, backend='etree'):
+    """Виміряти один запуск (виконується в окремому процесі)"""
+    phases = {}
+    output_dir = tempfile.mkdtemp(prefix='xef_bench_')
+    try:
+        extractor = XEFExtractor(xef_file, streaming=streaming, quiet=True, backend=backend)
+        if streaming:
+            _timed(phases, 'extract_streaming', extractor._extract_streaming)
+        else:
+            _timed(phases, 'parse', extractor.parse)
+            for name, method in TREE_PHASES:
+                _timed(phases, name, getattr(extractor, method))
+        _timed(phases, 'save_to_files', extractor.save_to_files, output_dir)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {
+        'phases': phases,
+        'total_seconds': sum(phases.values()),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def run_benchmarks(sizes, modes, work_dir, variables, st_lines, repeat, backends=('etree',)):
+    """Згенерувати входи й виміряти кожну комбінацію розміру та режиму"""
+    results = []
+    for size in sizes:
+        counts = counts_for_size(size, variables, st_lines)
+        xef_file = Path(work_dir) / f"bench_{format_size(size)}_v{variables}_l{st_lines}.xef"
+        if not xef_file.exists():
+            print(f"⚙ Генерація {xef_file.name}...", file=sys.stderr)
+            generate_xef(xef_file, variables=variables, st_lines=st_lines, **counts)
+        actual_size = xef_file.stat().st_size
+
+        for backend in backends:
+            for mode in modes:
+                for run in range(repeat):
+                    # Новий процес на кожен запуск - щоб пікова RSS не накопичувалась
+                    with ProcessPoolExecutor(max_workers=1) as pool:
+                        measured = pool.submit(
+                            run_case, str(xef_file), mode == 'stream', backend).result()
+                    measured.update({
+                        'size': format_size(size),
+                        'file_bytes': actual_size,
+                        'backend': backend,
+                        'mode': mode,
+                        'run': run,
+                        'counts': counts,
+                    })
+                    results.append(measured)
+                    print(f"  ✓ {format_size(size):>6} {backend:>5} {mode:>6} #{run}: "
+                          f"{measured['total_seconds']:.2f} с, "
+                          f"RSS {measured['peak_rss_kb']} КБ", file=sys.stderr)
+    return results
+
+
+def main():
+    """Головна функція"""
+    parser = argparse.ArgumentParser(
+        description="Бенчмарк XEFExtractor на синтетичних XEF файлах")
+    sub = parser.add_subparsers(dest='command')
+
+    gen = sub.add_parser('generate', help="згенерувати синтетичний XEF")
+    gen.add_argument('output', help="шлях до XEF файлу")
+    gen.add_argument('--size', help="приблизний розмір (напр. 100MB); замінює лічильники")
+    gen.add_argument('--fb', type=int, default=DEFAULT_MIX['fb'])
+    gen.add_argument('--ddt', type=int, default=DEFAULT_MIX['ddt'])
+    gen.add_argument('--ef', type=int, default=DEFAULT_MIX['ef'])
+    gen.add_argument('--dfb', type=int, default=DEFAULT_MIX['dfb'])
+    gen.add_argument('--programs', type=int, default=DEFAULT_MIX['programs'])
+    gen.add_argument('--global-vars', type=int, default=DEFAULT_MIX['global_vars'])
+    gen.add_argument('--variables', type=int, default=8, help="змінних у кожній секції")
+    gen.add_argument('--st-lines', type=int, default=40, help="рядків у кожному ST тілі")
+
+    run = sub.add_parser('run', help="виміряти швидкодію")
+    run.add_argument('--sizes', default='1MB,10MB,100MB',
+                     help="розміри входів через кому (до 1GB)")
+    run.add_argument('--modes', default='tree,stream', help="режими: tree,stream")
+    run.add_argument('--backends', default='etree',
+                     help="бекенди парсера через кому: etree,lxml,expat")
+    run.add_argument('--variables', type=int, default=8)
+    run.add_argument('--st-lines', type=int, default=40)
+    run.add_argument('--repeat', type=int, default=1)
+    run.add_argument('--work-dir', default=None,
+                     help="каталог для згенерованих XEF (кешуються між запусками)")
+    run.add_argument('-o', '--output', default='-', help="JSON з результатами ('-' - stdout)")
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        if args.size:
+            counts = counts_for_size(parse_size(args.size), args.variables, args.st_lines)
+        else:
+            counts = {'fb': args.fb, 'ddt': args.ddt, 'ef': args.ef, 'dfb': args.dfb,
+                      'programs': args.programs, 'global_vars': args.global_vars}
+        size = generate_xef(args.output, variables=args.variables,
+                            st_lines=args.st_lines, **counts)
+        print(f"✓ {args.output}: {size} байт, {counts}")
+        return
+
+    if args.command != 'run':
+        parser.print_help()
+        sys.exit(1)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='xef_bench_inputs_')
+    Path(work_dir).mkdir(parents=True, exist_ok=True)
+    results = run_benchmarks(
+        [parse_size(size) for size in args.sizes.split(',')],
+        [mode.strip() for mode in args.modes.split(',')],
+        work_dir, args.variables, args.st_lines, args.repeat,
+        [backend.strip() for backend in args.backends.split(',')],
+    )
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"✓ Результати: {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,17 +6,546 @@ XEF Code Extractor - Витягує тільки код програм з Unity
 """
 
 import xml.etree.ElementTree as ET
+import argparse
+import csv
+import difflib
+import fnmatch
+import functools
+import hashlib
+import io
+import json
 import sys
 import os
+import time
+import tracemalloc
+import zipfile
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 
+from xef_backends import (DEFAULT_BACKEND, EXTRACTED_FIELDS, ParseSpec, add_backend_argument,
+                          get_backend)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+PROJECT_INFO_NAME = 'PROJECT_INFO.txt'
+
+# Помилки читання XEF/ZEF (див. XEFExtractor._open_source): пошкоджений ZEF
+# дає zlib.error або BadZipFile (CRC) посеред парсингу, а не при відкритті
+READ_ERRORS = (ET.ParseError, OSError, ValueError, zipfile.BadZipFile, zlib.error)
+GLOBAL_VARIABLES_ST = 'VAR_GLOBAL.st'
+GLOBAL_VARIABLES_CSV = 'GLOBAL_VARIABLES.csv'
+# Глобальні змінні, відібрані фільтром --only var:ШАБЛОН: окремі файли, щоб
+# не замінити повну таблицю її частиною
+SELECTED_VARIABLES_ST = 'VAR_GLOBAL_SELECTED.st'
+SELECTED_VARIABLES_CSV = 'GLOBAL_VARIABLES_SELECTED.csv'
+MANIFEST_NAME = '.xef_manifest.json'
+
+# Вихідні файли юнітів: ключ extracted_data -> (каталог, метод рендерингу)
+OUTPUT_LAYOUT = (
+    ('fb_sources', 'FunctionBlocks', '_render_fb'),
+    ('ddt_sources', 'DataTypes', '_render_ddt'),
+    ('ef_sources', 'Functions', '_render_ef'),
+    ('dfb_sources', 'FunctionBlocks', '_render_dfb'),
+    ('programs', 'Programs', '_render_program'),
+)
+
+# Види юнітів для фільтра --only: вид -> тег блоку в XEF
+UNIT_KINDS = {
+    'fb': 'FBSource',
+    'ddt': 'DDTSource',
+    'ef': 'EFSource',
+    'dfb': 'DFBSource',
+    'program': 'program',
+    'var': 'dataBlock',
+}
+
+# Атрибут з ім'ям юніта, доступний вже на початку елемента
+NAME_ATTRIBUTES = {
+    'FBSource': 'nameOfFBType',
+    'DDTSource': 'DDTName',
+    'EFSource': 'nameOfEFType',
+    'DFBSource': 'nameOfDFBType',
+}
+
+
+def parse_unit_filters(specs):
+    """['fb:Valve*', 'program:MAIN'] -> {'FBSource': ['Valve*'], 'program': ['MAIN']}
+    
+    Вид без шаблону ('ddt') означає всі юніти цього виду.
+    """
+    filters = {}
+    for spec in specs:
+        kind, _, pattern = spec.partition(':')
+        tag = UNIT_KINDS.get(kind.strip().lower())
+        if tag is None:
+            raise ValueError(f"невідомий вид юніта '{kind}' (можливі: {', '.join(UNIT_KINDS)})")
+        filters.setdefault(tag, []).append(pattern.strip() or '*')
+    return filters
+
+
+# Тип юніта в XEF для кожного ключа extracted_data
+UNIT_TYPES = {
+    'fb_sources': 'FBSource',
+    'ddt_sources': 'DDTSource',
+    'ef_sources': 'EFSource',
+    'dfb_sources': 'DFBSource',
+    'programs': 'program',
+    'variables': 'dataBlock',
+}
+
+# Поля юнітів зі списками змінних
+VARIABLE_FIELDS = (
+    'input_parameters', 'output_parameters', 'inout_parameters',
+    'private_variables', 'public_variables', 'structure',
+)
+
+
+# ---------------------------------------------------------------------------
+# Модель даних: компактні записи з __slots__ замість словників
+# ---------------------------------------------------------------------------
+
+class Record:
+    """Базовий запис з __slots__ (без __dict__ на кожен екземпляр)"""
+    
+    __slots__ = ()
+    
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+    
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    __hash__ = None
+    
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class Variable(Record):
+    """Змінна (параметр, локальна змінна або поле DDT)"""
+    
+    __slots__ = ('name', 'type', 'comment', 'initial_value')
+    
+    def __init__(self, name, type, comment='', initial_value=''):
+        self.name = name
+        self.type = type
+        self.comment = comment
+        self.initial_value = initial_value
+
+
+class FBProgram(Record):
+    """Секція коду функціонального блоку"""
+    
+    __slots__ = ('name', 'code', 'language')
+    
+    def __init__(self, name, code='', language=None):
+        self.name = name
+        self.code = code
+        self.language = language
+
+
+class FunctionBlock(Record):
+    """Функціональний блок (FBSource)"""
+    
+    __slots__ = ('name', 'version', 'comment', 'input_parameters', 'output_parameters',
+                 'inout_parameters', 'private_variables', 'public_variables', 'programs')
+    
+    def __init__(self, name, version=None, comment='', input_parameters=(),
+                 output_parameters=(), inout_parameters=(), private_variables=(),
+                 public_variables=(), programs=()):
+        self.name = name
+        self.version = version
+        self.comment = comment
+        self.input_parameters = list(input_parameters)
+        self.output_parameters = list(output_parameters)
+        self.inout_parameters = list(inout_parameters)
+        self.private_variables = list(private_variables)
+        self.public_variables = list(public_variables)
+        self.programs = list(programs)
+
+
+class DataType(Record):
+    """Тип даних (DDTSource)"""
+    
+    __slots__ = ('name', 'version', 'comment', 'structure')
+    
+    def __init__(self, name, version=None, comment='', structure=()):
+        self.name = name
+        self.version = version
+        self.comment = comment
+        self.structure = list(structure)
+
+
+class ExternalFunction(Record):
+    """Зовнішня функція (EFSource)"""
+    
+    __slots__ = ('name', 'version', 'comment', 'input_parameters', 'output_parameters')
+    
+    def __init__(self, name, version=None, comment='', input_parameters=(),
+                 output_parameters=()):
+        self.name = name
+        self.version = version
+        self.comment = comment
+        self.input_parameters = list(input_parameters)
+        self.output_parameters = list(output_parameters)
+
+
+class DFBlock(Record):
+    """DFB блок (DFBSource)"""
+    
+    __slots__ = ('name', 'version', 'comment', 'code', 'language')
+    
+    def __init__(self, name, version=None, comment='', code='', language=None):
+        self.name = name
+        self.version = version
+        self.comment = comment
+        self.code = code
+        self.language = language
+
+
+class Program(Record):
+    """Програма / секція (program)"""
+    
+    __slots__ = ('name', 'type', 'task', 'section_order', 'comment', 'code', 'language')
+    
+    def __init__(self, name, type='', task='', section_order='', comment='', code='',
+                 language=None):
+        self.name = name
+        self.type = type
+        self.task = task
+        self.section_order = section_order
+        self.comment = comment
+        self.code = code
+        self.language = language
+
+
+class GlobalVariable(Record):
+    """Глобальна змінна проекту (для потокового API; у extracted_data - VariableTable)"""
+    
+    __slots__ = ('name', 'type', 'address', 'initial_value', 'comment')
+    
+    def __init__(self, name, type, address='', initial_value='', comment=''):
+        self.name = name
+        self.type = type
+        self.address = address
+        self.initial_value = initial_value
+        self.comment = comment
+
+
+def unit_to_json(key, unit):
+    """Юніт -> словник для JSON Lines
+    
+    Спільні поля всіх видів: type (тег у XEF), name, version, comment,
+    variables (секція -> список змінних) і code (список секцій коду
+    з name, language, code). Поля, специфічні для виду, додаються поруч.
+    """
+    item = {
+        'type': UNIT_TYPES[key],
+        'name': unit.name,
+        'version': getattr(unit, 'version', None),
+        'comment': unit.comment,
+        'variables': {},
+        'code': [],
+    }
+    for field in VARIABLE_FIELDS:
+        variables = getattr(unit, field, None)
+        if variables is not None:
+            item['variables'][field] = [
+                {'name': var.name, 'type': var.type, 'comment': var.comment,
+                 'initial_value': var.initial_value}
+                for var in variables
+            ]
+    
+    if isinstance(unit, FunctionBlock):
+        item['code'] = [{'name': section.name, 'language': section.language, 'code': section.code}
+                        for section in unit.programs]
+    elif isinstance(unit, (DFBlock, Program)):
+        if unit.code:
+            item['code'] = [{'name': unit.name, 'language': unit.language, 'code': unit.code}]
+        if isinstance(unit, Program):
+            item['program_type'] = unit.type
+            item['task'] = unit.task
+            item['section_order'] = unit.section_order
+    elif isinstance(unit, GlobalVariable):
+        item['data_type'] = unit.type
+        item['address'] = unit.address
+        item['initial_value'] = unit.initial_value
+    return item
+
+
+class VariableTable:
+    """Таблиця глобальних змінних проекту (dataBlock) у колонковому вигляді
+    
+    Кожна колонка - окремий список, тому на рядок не створюється ні
+    словник, ні об'єкт.
+    """
+    
+    __slots__ = ('names', 'types', 'addresses', 'initial_values', 'comments')
+    
+    # Ім'я юніта для diff і звітів
+    name = 'VAR_GLOBAL'
+    
+    def __init__(self):
+        self.names = []
+        self.types = []
+        self.addresses = []
+        self.initial_values = []
+        self.comments = []
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def __getstate__(self):
+        return tuple(getattr(self, column) for column in self.__slots__)
+    
+    def __setstate__(self, state):
+        for column, values in zip(self.__slots__, state):
+            setattr(self, column, values)
+    
+    def append(self, name, type, address='', initial_value='', comment=''):
+        """Додати рядок"""
+        self.names.append(name)
+        self.types.append(type)
+        self.addresses.append(address)
+        self.initial_values.append(initial_value)
+        self.comments.append(comment)
+    
+    def extend(self, other):
+        """Додати всі рядки іншої таблиці (злиття результатів воркерів)"""
+        for column in self.__slots__:
+            getattr(self, column).extend(getattr(other, column))
+    
+    def sorted_rows(self):
+        """Рядки (ім'я, тип, адреса, початкове значення, коментар), відсортовані за ім'ям
+        
+        Сортування стабільне, тому однакові імена зберігають порядок з XEF.
+        """
+        order = sorted(range(len(self.names)), key=lambda i: self.names[i] or '')
+        for i in order:
+            yield (self.names[i], self.types[i], self.addresses[i],
+                   self.initial_values[i], self.comments[i])
+
+
+def peak_rss_kb():
+    """Пікова пам'ять процесу в КБ (None якщо недоступно)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS повертає байти, Linux - кілобайти
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class ContentStore:
+    """Спільне сховище файлів бібліотечних юнітів з адресацією за вмістом
+    
+    Файл FB/DDT/EF/DFB зберігається один раз як objects/<xx>/<sha256>
+    (той самий хеш, що в маніфесті), а у вихідні папки проектів
+    потрапляє жорстким посиланням на нього. Однакові блоки з багатьох
+    проектів займають місце на диску і записуються один раз. Якщо
+    посилання неможливе (інша файлова система), файл копіюється.
+    """
+    
+    # Каталоги виводу, файли яких потрапляють у сховище (програми - ні)
+    DIRECTORIES = frozenset(('FunctionBlocks', 'DataTypes', 'Functions'))
+    
+    def __init__(self, root):
+        self.root = Path(root)
+        self.stored = 0    # нових об'єктів записано
+        self.linked = 0    # посилань створено
+    
+    def accepts(self, rel_path):
+        return rel_path.split('/', 1)[0] in self.DIRECTORIES
+    
+    def object_path(self, digest):
+        return self.root / 'objects' / digest[:2] / digest
+    
+    def link(self, target, digest, content):
+        """Помістити вміст у сховище (якщо його там ще немає) і зв'язати target з ним
+        
+        Повертає False, якщо target вже є посиланням на цей об'єкт.
+        """
+        obj = self.object_path(digest)
+        if not obj.is_file():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            # Запис через тимчасовий файл: паралельні процеси пакетної
+            # обробки можуть зберігати той самий об'єкт одночасно
+            tmp = obj.with_name(f"{digest}.{os.getpid()}.tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp, obj)
+            self.stored += 1
+        
+        if target.exists():
+            if os.path.samefile(target, obj):
+                return False
+            target.unlink()
+        try:
+            os.link(obj, target)
+        except OSError:
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(content)
+        self.linked += 1
+        return True
+
+
+class Metrics:
+    """Метрики екстракції: час і пам'ять по фазах та типах юнітів
+    
+    Пікова RSS знімається завжди. З trace_memory=True додатково
+    вимірюється пік алокацій Python через tracemalloc (повільніше).
+    """
+    
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.unit_types = {}
+        self.bytes_written = {}
+        # Найбільший пік tracemalloc поточної фази до останнього скидання
+        self._phase_peak = 0
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+    
+    def _reset_peak(self):
+        # reset_peak() є тільки з Python 3.9; раніше пік накопичується.
+        # Пік до скидання зберігається, щоб пік фази не зменшувався
+        if self.trace_memory and hasattr(tracemalloc, 'reset_peak'):
+            self._phase_peak = max(self._phase_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+    
+    @contextmanager
+    def phase(self, name):
+        """Виміряти фазу (parse, extract, save)"""
+        self._reset_peak()
+        self._phase_peak = 0
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {
+                'seconds': time.perf_counter() - started,
+                'peak_rss_kb': peak_rss_kb(),
+            }
+            if self.trace_memory:
+                entry['peak_traced_bytes'] = max(self._phase_peak,
+                                                 tracemalloc.get_traced_memory()[1])
+            self.phases[name] = entry
+    
+    def unit_started(self):
+        """Початок обробки юніта"""
+        self._reset_peak()
+        traced = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        return time.perf_counter(), traced
+    
+    def unit_finished(self, tag, started, data):
+        """Кінець обробки юніта: час, кількість, змінні, пік пам'яті"""
+        started_at, traced_before = started
+        entry = self.unit_types.get(tag)
+        if entry is None:
+            entry = self.unit_types[tag] = {
+                'count': 0, 'variables': 0, 'seconds': 0.0,
+            }
+        entry['seconds'] += time.perf_counter() - started_at
+        if data is None:
+            return
+        entry['count'] += 1
+        if isinstance(data, Record):
+            entry['variables'] += sum(len(getattr(data, field, None) or ()) for field in VARIABLE_FIELDS)
+        elif isinstance(data, int):
+            # Обробник блоку з таблицею (dataBlock) повертає кількість рядків
+            entry['variables'] += data
+        if self.trace_memory:
+            # Пік алокацій під час обробки одного юніта цього типу
+            peak = tracemalloc.get_traced_memory()[1] - traced_before
+            entry['peak_unit_bytes'] = max(entry.get('peak_unit_bytes', 0), peak)
+    
+    def row_started(self):
+        """Початок обробки рядка: тільки час (пік пам'яті міряє юніт блоку)"""
+        return time.perf_counter()
+    
+    def row_finished(self, tag, started, row):
+        """Кінець обробки потокового дочірнього елемента блоку (рядка таблиці)"""
+        entry = self.unit_types.get(tag)
+        if entry is None:
+            entry = self.unit_types[tag] = {
+                'count': 0, 'variables': 0, 'seconds': 0.0,
+            }
+        entry['seconds'] += time.perf_counter() - started
+        if row is not None:
+            entry['variables'] += 1
+    
+    def merge_unit_types(self, unit_types):
+        """Додати метрики юнітів з іншого процесу (воркера -j)"""
+        for tag, other in unit_types.items():
+            entry = self.unit_types.setdefault(tag, {'count': 0, 'variables': 0, 'seconds': 0.0})
+            for field in ('count', 'variables', 'seconds'):
+                entry[field] += other[field]
+            if 'peak_unit_bytes' in other:
+                entry['peak_unit_bytes'] = max(entry.get('peak_unit_bytes', 0),
+                                               other['peak_unit_bytes'])
+    
+    def add_written(self, rel_path, size):
+        """Врахувати записані байти для каталогу виводу"""
+        directory = rel_path.split('/', 1)[0] if '/' in rel_path else '.'
+        self.bytes_written[directory] = self.bytes_written.get(directory, 0) + size
+    
+    def to_dict(self):
+        """Звіт у вигляді словника для JSON"""
+        return {
+            'phases': self.phases,
+            'unit_types': self.unit_types,
+            'bytes_written': self.bytes_written,
+            'peak_rss_kb': peak_rss_kb(),
+        }
+
 
 class XEFExtractor:
     """Екстрактор коду з XEF файлів"""
     
-    def __init__(self, xef_file_path):
+    # Обробники елементів верхнього рівня: тег -> (ключ у extracted_data, метод).
+    # Ключ None - обробник сам зберігає результат.
+    DEFAULT_HANDLERS = {
+        'contentHeader': (None, '_extract_project_info'),
+        'FBSource': ('fb_sources', '_extract_fb'),
+        'DDTSource': ('ddt_sources', '_extract_ddt'),
+        'EFSource': ('ef_sources', '_extract_ef'),
+        'DFBSource': ('dfb_sources', '_extract_dfb'),
+        'program': ('programs', '_extract_program'),
+        'dataBlock': (None, '_extract_data_block'),
+    }
+    
+    # Потокова обробка дочірніх елементів великих блоків верхнього рівня:
+    # тег блоку -> (тег дочірнього елемента, ключ у extracted_data, метод).
+    # Кожен дочірній елемент обробляється і звільняється одразу, не чекаючи
+    # кінця блоку.
+    DEFAULT_CHILD_HANDLERS = {
+        'dataBlock': ('variables', 'variables', '_extract_global_variable'),
+    }
+    
+    def __init__(self, xef_file_path, streaming=False, quiet=False, metrics=None,
+                 backend=DEFAULT_BACKEND, only=None):
         self.xef_file_path = Path(xef_file_path)
+        # Фільтр юнітів ('fb:Valve*', ...); None - витягувати все
+        self.filters = parse_unit_filters(only) if only else None
+        # Потоковий режим: iterparse без побудови повного дерева
+        self.streaming = streaming
+        # Бекенд парсера: 'etree', 'lxml', 'expat' (див. xef_backends.BACKENDS)
+        self.backend = get_backend(backend)
+        # quiet вимикає вивід прогресу; помилка доступна в self.error
+        self.quiet = quiet
+        self.metrics = metrics
+        self.error = None
         self.tree = None
         self.root = None
         self.extracted_data = {
@@ -26,206 +555,514 @@ class XEFExtractor:
             'ef_sources': [],      # Зовнішні функції
             'dfb_sources': [],     # DFB блоки
             'programs': [],        # Програми
-            'variables': {},       # Змінні проекту
+            'variables': VariableTable(),  # Глобальні змінні проекту (dataBlock)
+        }
+        self.handlers = {
+            tag: (key, getattr(self, method))
+            for tag, (key, method) in self.DEFAULT_HANDLERS.items()
+        }
+        self.child_handlers = {
+            tag: (child_tag, key, getattr(self, method))
+            for tag, (child_tag, key, method) in self.DEFAULT_CHILD_HANDLERS.items()
         }
+    
+    def register_handler(self, tag, handler, key=None):
+        """Зареєструвати обробник для елемента верхнього рівня
+        
+        handler(element) повертає дані юніта або None. Якщо вказано key,
+        результат додається до списку extracted_data[key].
+        """
+        if key is not None:
+            self.extracted_data.setdefault(key, [])
+        self.handlers[tag] = (key, handler)
+    
+    def _dispatch(self, element):
+        """Передати елемент верхнього рівня обробнику і зберегти результат"""
+        result = self._handle(element)
+        if result is not None:
+            key, data = result
+            self.extracted_data[key].append(data)
+    
+    def _handle(self, element):
+        """Обробити елемент верхнього рівня: (ключ, дані) або None"""
+        entry = self.handlers.get(element.tag)
+        if entry is None:
+            return None
+        if self.filters is not None and not self._wanted_block(element.tag, element.attrib):
+            return None
+        key, handler = entry
+        if self.metrics is None:
+            data = handler(element)
+        else:
+            started = self.metrics.unit_started()
+            data = handler(element)
+            self.metrics.unit_finished(element.tag, started, data)
+        if data is None or key is None:
+            return None
+        if self.filters is not None and not self._wanted_name(element.tag, getattr(data, 'name', None)):
+            return None
+        return key, data
+    
+    def _wanted_block(self, tag, attrib):
+        """Чи пройде блок фільтр (за атрибутом з ім'ям, на початку елемента)"""
+        if self.filters is None or tag not in UNIT_KINDS.values():
+            return True
+        if tag not in self.filters:
+            return False
+        name_attribute = NAME_ATTRIBUTES.get(tag)
+        if name_attribute is None:
+            # Ім'я програми відоме тільки з identProgram - перевіряється після обробки
+            return True
+        return self._wanted_name(tag, attrib.get(name_attribute))
+    
+    def _wanted_name(self, tag, name):
+        """Чи відповідає ім'я юніта шаблонам фільтра"""
+        patterns = self.filters.get(tag) if self.filters is not None else None
+        if patterns is None or tag == 'dataBlock':
+            # Для dataBlock фільтр застосовується до кожної змінної окремо
+            return True
+        return name is not None and any(fnmatch.fnmatchcase(name, p) for p in patterns)
+        
+    def _log(self, message):
+        """Вивести повідомлення прогресу (якщо не quiet)"""
+        if not self.quiet:
+            print(message)
+    
+    def _fail(self, error):
+        """Запам'ятати і вивести помилку читання"""
+        self.error = str(error)
+        self._log(f"✗ Помилка читання файлу: {error}")
+        return False
+    
+    @contextmanager
+    def _phase(self, name):
+        """Фаза з вимірюванням (якщо метрики увімкнено)"""
+        if self.metrics is None:
+            yield
+        else:
+            with self.metrics.phase(name):
+                yield
+    
+    @contextmanager
+    def _open_source(self):
+        """Відкрити XEF як бінарний потік
         
+        Для архівів ZEF XEF читається прямо з потоку розпакування,
+        без запису розпакованого XML на диск.
+        """
+        if not zipfile.is_zipfile(self.xef_file_path):
+            with open(self.xef_file_path, 'rb') as f:
+                yield f
+            return
+        
+        with zipfile.ZipFile(self.xef_file_path) as archive:
+            with archive.open(self._find_xef_member(archive)) as f:
+                yield f
+    
+    def _find_xef_member(self, archive):
+        """Знайти XEF файл всередині архіву (переважно unitpro.xef)"""
+        members = [name for name in archive.namelist()
+                   if name.lower().endswith('.xef')]
+        if not members:
+            raise ValueError(f"в архіві {self.xef_file_path.name} немає XEF файлу")
+        for name in members:
+            if Path(name).name.lower() == 'unitpro.xef':
+                return name
+        return members[0]
+    
     def parse(self):
         """Парсинг XEF файлу"""
+        with self._phase('parse'):
+            return self._parse()
+    
+    def _parse(self):
+        """Парсинг без вимірювання"""
+        if self.streaming:
+            # Дерево не будується - лише перевіряємо, що файл можна відкрити
+            try:
+                with self._open_source():
+                    pass
+                self._log(f"✓ Файл відкрито (потоковий режим): {self.xef_file_path.name}")
+                return True
+            except READ_ERRORS as e:
+                return self._fail(e)
         try:
-            self.tree = ET.parse(self.xef_file_path)
-            self.root = self.tree.getroot()
-            print(f"✓ Файл успішно прочитано: {self.xef_file_path.name}")
+            with self._open_source() as source:
+                self.root = self.backend.parse(source, self._parse_spec())
+            self.tree = ET.ElementTree(self.root)
+            self._log(f"✓ Файл успішно прочитано: {self.xef_file_path.name}")
             return True
         except Exception as e:
-            print(f"✗ Помилка читання файлу: {e}")
-            return False
+            return self._fail(e)
     
     def extract_project_info(self):
         """Витягти інформацію про проект (без технічних деталей)"""
         content_header = self.root.find('contentHeader')
         if content_header is not None:
-            self.extracted_data['project_info'] = {
-                'name': content_header.get('name', 'Unknown'),
-                'version': content_header.get('version', '0.0.0'),
-            }
+            self._extract_project_info(content_header)
     
     def extract_fb_sources(self):
         """Витягти функціональні блоки (FBSource)"""
         for fb_source in self.root.findall('FBSource'):
-            fb_data = {
-                'name': fb_source.get('nameOfFBType'),
-                'version': fb_source.get('version'),
-                'comment': self._get_text(fb_source.find('comment')),
-                'input_parameters': [],
-                'output_parameters': [],
-                'inout_parameters': [],
-                'private_variables': [],
-                'public_variables': [],
-                'programs': []
-            }
-            
-            # Вхідні параметри
-            input_params = fb_source.find('inputParameters')
-            if input_params is not None:
-                fb_data['input_parameters'] = self._extract_variables(input_params)
-            
-            # Вихідні параметри
-            output_params = fb_source.find('outputParameters')
-            if output_params is not None:
-                fb_data['output_parameters'] = self._extract_variables(output_params)
-            
-            # InOut параметри
-            inout_params = fb_source.find('inOutParameters')
-            if inout_params is not None:
-                fb_data['inout_parameters'] = self._extract_variables(inout_params)
-            
-            # Приватні змінні
-            private_vars = fb_source.find('privateLocalVariables')
-            if private_vars is not None:
-                fb_data['private_variables'] = self._extract_variables(private_vars)
-            
-            # Публічні змінні
-            public_vars = fb_source.find('publicLocalVariables')
-            if public_vars is not None:
-                fb_data['public_variables'] = self._extract_variables(public_vars)
-            
-            # Програми FB
-            for fb_program in fb_source.findall('FBProgram'):
-                program_data = {
-                    'name': fb_program.get('name'),
-                    'code': ''
-                }
-                
-                # ST код
-                st_source = fb_program.find('STSource')
-                if st_source is not None:
-                    program_data['code'] = self._get_text(st_source)
-                    program_data['language'] = 'ST'
-                
-                # SFC код
-                sfc_source = fb_program.find('SFCSource')
-                if sfc_source is not None:
-                    program_data['code'] = self._extract_sfc(sfc_source)
-                    program_data['language'] = 'SFC'
-                
-                fb_data['programs'].append(program_data)
-            
-            self.extracted_data['fb_sources'].append(fb_data)
+            self.extracted_data['fb_sources'].append(self._extract_fb(fb_source))
     
     def extract_ddt_sources(self):
         """Витягти типи даних (DDTSource)"""
         for ddt_source in self.root.findall('DDTSource'):
-            ddt_data = {
-                'name': ddt_source.get('DDTName'),
-                'version': ddt_source.get('version'),
-                'comment': self._get_text(ddt_source.find('comment')),
-                'structure': []
-            }
-            
-            # Структура DDT
-            structure = ddt_source.find('structure')
-            if structure is not None:
-                ddt_data['structure'] = self._extract_variables(structure)
-            
-            self.extracted_data['ddt_sources'].append(ddt_data)
+            self.extracted_data['ddt_sources'].append(self._extract_ddt(ddt_source))
     
     def extract_ef_sources(self):
         """Витягти зовнішні функції (EFSource)"""
         for ef_source in self.root.findall('EFSource'):
-            ef_data = {
-                'name': ef_source.get('nameOfEFType'),
-                'version': ef_source.get('version'),
-                'comment': self._get_text(ef_source.find('comment')),
-                'input_parameters': [],
-                'output_parameters': [],
-            }
-            
-            # Шукаємо в ExternalToolsOnly
-            external_tools = ef_source.find('ExternalToolsOnly')
-            if external_tools is not None:
-                input_params = external_tools.find('inputParameters')
-                if input_params is not None:
-                    ef_data['input_parameters'] = self._extract_variables(input_params)
-                
-                output_params = external_tools.find('outputParameters')
-                if output_params is not None:
-                    ef_data['output_parameters'] = self._extract_variables(output_params)
-            
-            self.extracted_data['ef_sources'].append(ef_data)
+            self.extracted_data['ef_sources'].append(self._extract_ef(ef_source))
     
     def extract_dfb_sources(self):
         """Витягти DFB блоки (DFBSource)"""
         for dfb_source in self.root.findall('DFBSource'):
-            dfb_data = {
-                'name': dfb_source.get('nameOfDFBType'),
-                'version': dfb_source.get('version'),
-                'comment': self._get_text(dfb_source.find('comment')),
-                'code': ''
-            }
-            
-            # ST код
-            st_source = dfb_source.find('STSource')
-            if st_source is not None:
-                dfb_data['code'] = self._get_text(st_source)
-                dfb_data['language'] = 'ST'
-            
-            self.extracted_data['dfb_sources'].append(dfb_data)
+            self.extracted_data['dfb_sources'].append(self._extract_dfb(dfb_source))
     
     def extract_programs(self):
         """Витягти основні програми"""
         for program in self.root.findall('program'):
-            # Шукаємо identProgram для отримання імені та інфо
-            ident_program = program.find('identProgram')
-            if ident_program is not None:
-                prog_data = {
-                    'name': ident_program.get('name'),
-                    'type': ident_program.get('type', ''),
-                    'task': ident_program.get('task', ''),
-                    'section_order': ident_program.get('SectionOrder', ''),
-                    'comment': self._get_text(program.find('comment')),
-                    'code': ''
-                }
-            else:
-                # Fallback якщо немає identProgram
-                prog_data = {
-                    'name': program.get('name', 'Unknown'),
-                    'task': program.get('task', ''),
-                    'comment': self._get_text(program.find('comment')),
-                    'code': ''
-                }
+            prog_data = self._extract_program(program)
+            if prog_data is not None:
+                self.extracted_data['programs'].append(prog_data)
+    
+    def extract_variables(self):
+        """Витягти глобальні змінні проекту (dataBlock)"""
+        for data_block in self.root.findall('dataBlock'):
+            self._extract_data_block(data_block)
+    
+    def _extract_data_block(self, data_block):
+        """Витягти змінні з dataBlock у таблицю extracted_data['variables']
+        
+        Повертає кількість доданих рядків (для метрик). У потоковому режимі
+        змінні приходять окремо через child_handlers, і блок уже порожній.
+        """
+        table = self.extracted_data['variables']
+        count = 0
+        for var in data_block.findall('variables'):
+            row = self._extract_global_variable(var)
+            if row is not None:
+                table.append(*row)
+                count += 1
+        return count
+    
+    def _extract_global_variable(self, var):
+        """Витягти одну глобальну змінну: рядок таблиці або None
+        
+        Рядок - кортеж у порядку колонок VariableTable.
+        """
+        if self.filters is not None:
+            patterns = self.filters.get('dataBlock', ())
+            name = var.get('name')
+            if name is None or not any(fnmatch.fnmatchcase(name, p) for p in patterns):
+                return None
+        type_name = var.get('typeName')
+        if type_name:
+            type_name = sys.intern(type_name)
+        init = var.find('variableInit')
+        return (
+            var.get('name'),
+            type_name,
+            var.get('topologicalAddress', ''),
+            init.get('value', '') if init is not None else '',
+            self._get_text(var.find('comment')),
+        )
+    
+    def _extract_project_info(self, content_header):
+        """Витягти інформацію про проект з contentHeader"""
+        self.extracted_data['project_info'] = {
+            'name': content_header.get('name', 'Unknown'),
+            'version': content_header.get('version', '0.0.0'),
+        }
+        # Результат тільки для метрик (ключ обробника None)
+        return self.extracted_data['project_info']
+    
+    def _extract_fb(self, fb_source):
+        """Витягти один функціональний блок (FBSource)"""
+        fb = FunctionBlock(
+            fb_source.get('nameOfFBType'),
+            fb_source.get('version'),
+            self._get_text(fb_source.find('comment')),
+        )
+        
+        # Вхідні параметри
+        input_params = fb_source.find('inputParameters')
+        if input_params is not None:
+            fb.input_parameters = self._extract_variables(input_params)
+        
+        # Вихідні параметри
+        output_params = fb_source.find('outputParameters')
+        if output_params is not None:
+            fb.output_parameters = self._extract_variables(output_params)
+        
+        # InOut параметри
+        inout_params = fb_source.find('inOutParameters')
+        if inout_params is not None:
+            fb.inout_parameters = self._extract_variables(inout_params)
+        
+        # Приватні змінні
+        private_vars = fb_source.find('privateLocalVariables')
+        if private_vars is not None:
+            fb.private_variables = self._extract_variables(private_vars)
+        
+        # Публічні змінні
+        public_vars = fb_source.find('publicLocalVariables')
+        if public_vars is not None:
+            fb.public_variables = self._extract_variables(public_vars)
+        
+        # Програми FB
+        for fb_program in fb_source.findall('FBProgram'):
+            program = FBProgram(fb_program.get('name'))
             
             # ST код
-            st_source = program.find('STSource')
+            st_source = fb_program.find('STSource')
             if st_source is not None:
-                prog_data['code'] = self._get_text(st_source)
-                prog_data['language'] = 'ST'
+                program.code = self._get_text(st_source)
+                program.language = 'ST'
             
             # SFC код
-            sfc_source = program.find('SFCSource')
+            sfc_source = fb_program.find('SFCSource')
             if sfc_source is not None:
-                prog_data['code'] = self._extract_sfc(sfc_source)
-                prog_data['language'] = 'SFC'
+                program.code = self._extract_sfc(sfc_source)
+                program.language = 'SFC'
             
-            # LD код
-            ld_source = program.find('LDSource')
-            if ld_source is not None:
-                prog_data['code'] = "<!-- LD Ladder Diagram -->\n"
-                prog_data['language'] = 'LD'
+            fb.programs.append(program)
+        
+        return fb
+    
+    def _extract_ddt(self, ddt_source):
+        """Витягти один тип даних (DDTSource)"""
+        ddt = DataType(
+            ddt_source.get('DDTName'),
+            ddt_source.get('version'),
+            self._get_text(ddt_source.find('comment')),
+        )
+        
+        # Структура DDT
+        structure = ddt_source.find('structure')
+        if structure is not None:
+            ddt.structure = self._extract_variables(structure)
+        
+        return ddt
+    
+    def _extract_ef(self, ef_source):
+        """Витягти одну зовнішню функцію (EFSource)"""
+        ef = ExternalFunction(
+            ef_source.get('nameOfEFType'),
+            ef_source.get('version'),
+            self._get_text(ef_source.find('comment')),
+        )
+        
+        # Шукаємо в ExternalToolsOnly
+        external_tools = ef_source.find('ExternalToolsOnly')
+        if external_tools is not None:
+            input_params = external_tools.find('inputParameters')
+            if input_params is not None:
+                ef.input_parameters = self._extract_variables(input_params)
             
-            if prog_data['name']:  # Додати тільки якщо є ім'я
-                self.extracted_data['programs'].append(prog_data)
+            output_params = external_tools.find('outputParameters')
+            if output_params is not None:
+                ef.output_parameters = self._extract_variables(output_params)
+        
+        return ef
+    
+    def _extract_dfb(self, dfb_source):
+        """Витягти один DFB блок (DFBSource)"""
+        dfb = DFBlock(
+            dfb_source.get('nameOfDFBType'),
+            dfb_source.get('version'),
+            self._get_text(dfb_source.find('comment')),
+        )
+        
+        # ST код
+        st_source = dfb_source.find('STSource')
+        if st_source is not None:
+            dfb.code = self._get_text(st_source)
+            dfb.language = 'ST'
+        
+        return dfb
+    
+    def _extract_program(self, program):
+        """Витягти одну програму (program)"""
+        # Шукаємо identProgram для отримання імені та інфо
+        ident_program = program.find('identProgram')
+        if ident_program is not None:
+            prog = Program(
+                ident_program.get('name'),
+                type=ident_program.get('type', ''),
+                task=ident_program.get('task', ''),
+                section_order=ident_program.get('SectionOrder', ''),
+                comment=self._get_text(program.find('comment')),
+            )
+        else:
+            # Fallback якщо немає identProgram
+            prog = Program(
+                program.get('name', 'Unknown'),
+                task=program.get('task', ''),
+                comment=self._get_text(program.find('comment')),
+            )
+        
+        # ST код
+        st_source = program.find('STSource')
+        if st_source is not None:
+            prog.code = self._get_text(st_source)
+            prog.language = 'ST'
+        
+        # SFC код
+        sfc_source = program.find('SFCSource')
+        if sfc_source is not None:
+            prog.code = self._extract_sfc(sfc_source)
+            prog.language = 'SFC'
+        
+        # LD код
+        ld_source = program.find('LDSource')
+        if ld_source is not None:
+            prog.code = "<!-- LD Ladder Diagram -->\n"
+            prog.language = 'LD'
+        
+        if not prog.name:  # Додати тільки якщо є ім'я
+            return None
+        return prog
+    
+    def _extract_streaming(self):
+        """Потокова екстракція
+        
+        Кожен елемент верхнього рівня обробляється одразу після закриття
+        і звільняється бекендом, тому пам'ять обмежена найбільшим юнітом,
+        а не розміром файлу.
+        """
+        data = self.extracted_data
+        for key, item in self._iter_results(self._parse_spec()):
+            if key == 'variables':
+                data[key].append(*item)
+            else:
+                data[key].append(item)
+    
+    def _iter_results(self, spec):
+        """Один потоковий прохід: (ключ extracted_data, дані) по одному"""
+        with self._open_source() as source:
+            for block_tag, elem in self.backend.iter_elements(source, spec):
+                if block_tag is None:
+                    result = self._handle(elem)
+                    if result is not None:
+                        yield result
+                else:
+                    _, key, handler = self.child_handlers[block_tag]
+                    if self.metrics is None:
+                        item = handler(elem)
+                    else:
+                        started = self.metrics.row_started()
+                        item = handler(elem)
+                        self.metrics.row_finished(block_tag, started, item)
+                    if item is not None:
+                        yield key, item
+    
+    def iter_units(self, kinds=None):
+        """Потоково віддавати юніти по одному: (ключ extracted_data, юніт)
+        
+        Файл читається одним потоковим проходом незалежно від режиму;
+        extracted_data не заповнюється і нічого не друкується, тому
+        пам'ять не залежить від розміру проекту, а ітерацію можна
+        перервати будь-коли. kinds - ключі extracted_data ('fb_sources',
+        'programs', ...); None - всі. Глобальні змінні віддаються як
+        GlobalVariable з ключем 'variables'.
+        """
+        spec = self._parse_spec(kinds)
+        for key, item in self._iter_results(spec):
+            if key == 'variables':
+                item = GlobalVariable(*item)
+            yield key, item
+    
+    def iter_fb_sources(self):
+        """Потоково віддавати функціональні блоки (FunctionBlock)"""
+        return (unit for _, unit in self.iter_units(('fb_sources',)))
+    
+    def iter_ddt_sources(self):
+        """Потоково віддавати типи даних (DataType)"""
+        return (unit for _, unit in self.iter_units(('ddt_sources',)))
+    
+    def iter_ef_sources(self):
+        """Потоково віддавати зовнішні функції (ExternalFunction)"""
+        return (unit for _, unit in self.iter_units(('ef_sources',)))
+    
+    def iter_dfb_sources(self):
+        """Потоково віддавати DFB блоки (DFBlock)"""
+        return (unit for _, unit in self.iter_units(('dfb_sources',)))
+    
+    def iter_programs(self):
+        """Потоково віддавати програми (Program)"""
+        return (unit for _, unit in self.iter_units(('programs',)))
+    
+    def iter_global_variables(self):
+        """Потоково віддавати глобальні змінні (GlobalVariable)"""
+        return (unit for _, unit in self.iter_units(('variables',)))
+    
+    def write_jsonl(self, stream):
+        """Записувати юніти у текстовий потік JSON Lines по мірі екстракції
+        
+        Один об'єкт на рядок (див. unit_to_json), потік скидається після
+        кожного юніта - дерево файлів не створюється. Повертає кількість
+        записаних юнітів або None при помилці читання.
+        """
+        count = 0
+        with self._phase('extract'):
+            try:
+                for key, unit in self.iter_units():
+                    stream.write(json.dumps(unit_to_json(key, unit), ensure_ascii=False))
+                    stream.write('\n')
+                    stream.flush()
+                    count += 1
+            except BrokenPipeError:
+                # Споживач закрив канал (наприклад | head) - не помилка читання
+                raise
+            except READ_ERRORS as e:
+                self._fail(e)
+                return None
+        return count
+    
+    def _parse_spec(self, kinds=None):
+        """Що потрібно від парсера для зареєстрованих обробників
+        
+        kinds обмежує блоки юнітів ключами extracted_data.
+        """
+        fields = {}
+        for tag, (_, method) in self.DEFAULT_HANDLERS.items():
+            # Вбудованим обробникам достатньо полів EXTRACTED_FIELDS;
+            # для замінених і нових обробників будується весь блок
+            if self.handlers.get(tag, (None, None))[1] == getattr(self, method):
+                fields[tag] = EXTRACTED_FIELDS
+        top_tags = self.handlers.keys()
+        if self.filters is not None:
+            # Блоки відфільтрованих видів не віддаються (expat їх не будує)
+            top_tags = [tag for tag in top_tags
+                        if tag not in UNIT_KINDS.values() or tag in self.filters]
+        if kinds is not None:
+            wanted = {UNIT_TYPES.get(key, key) for key in kinds}
+            top_tags = [tag for tag in top_tags
+                        if tag in wanted or tag not in UNIT_TYPES.values()]
+        return ParseSpec(
+            top_tags,
+            {tag: child_tag for tag, (child_tag, _, _) in self.child_handlers.items()},
+            fields,
+            accept=self._wanted_block if self.filters is not None else None,
+        )
     
     def _extract_variables(self, parent_element):
         """Витягти змінні з елемента"""
         variables = []
         for var in parent_element.findall('variables'):
-            var_data = {
-                'name': var.get('name'),
-                'type': var.get('typeName'),
-                'comment': self._get_text(var.find('comment')),
-                'initial_value': var.get('topologicalAddress', '')
-            }
-            variables.append(var_data)
+            type_name = var.get('typeName')
+            if type_name:
+                # Імена типів повторюються тисячі разів - зберігаємо один рядок
+                type_name = sys.intern(type_name)
+            variables.append(Variable(
+                var.get('name'),
+                type_name,
+                self._get_text(var.find('comment')),
+                var.get('topologicalAddress', ''),
+            ))
         return variables
     
     def _extract_sfc(self, sfc_element):
@@ -240,294 +1077,583 @@ class XEFExtractor:
     
     def extract_all(self):
         """Витягти всі дані"""
-        print("\n🔍 Початок екстракції...")
-        self.extract_project_info()
-        print(f"  ✓ Інформація про проект")
-        
-        self.extract_fb_sources()
-        print(f"  ✓ Функціональні блоки: {len(self.extracted_data['fb_sources'])}")
-        
-        self.extract_ddt_sources()
-        print(f"  ✓ Типи даних (DDT): {len(self.extracted_data['ddt_sources'])}")
-        
-        self.extract_ef_sources()
-        print(f"  ✓ Зовнішні функції (EF): {len(self.extracted_data['ef_sources'])}")
+        self._log("\n🔍 Початок екстракції...")
+        with self._phase('extract'):
+            if self.streaming:
+                try:
+                    self._extract_streaming()
+                except READ_ERRORS as e:
+                    return self._fail(e)
+            else:
+                # Один прохід по дочірніх елементах кореня
+                for element in self.root:
+                    self._dispatch(element)
         
-        self.extract_dfb_sources()
-        print(f"  ✓ DFB блоки: {len(self.extracted_data['dfb_sources'])}")
+        self._log(f"  ✓ Інформація про проект")
+        self._log(f"  ✓ Функціональні блоки: {len(self.extracted_data['fb_sources'])}")
+        self._log(f"  ✓ Типи даних (DDT): {len(self.extracted_data['ddt_sources'])}")
+        self._log(f"  ✓ Зовнішні функції (EF): {len(self.extracted_data['ef_sources'])}")
+        self._log(f"  ✓ DFB блоки: {len(self.extracted_data['dfb_sources'])}")
+        self._log(f"  ✓ Програми: {len(self.extracted_data['programs'])}")
+        self._log(f"  ✓ Глобальні змінні: {len(self.extracted_data['variables'])}")
+        return True
+    
+    def save_to_files(self, output_dir, incremental=False, store=None):
+        """Зберегти витягнуті дані у структуру файлів
         
-        self.extract_programs()
-        print(f"  ✓ Програми: {len(self.extracted_data['programs'])}")
+        В інкрементальному режимі файли з незміненим вмістом не
+        перезаписуються (mtime зберігається), а файли юнітів, яких
+        більше немає у проекті, видаляються. Хеші вмісту зберігаються
+        у маніфесті MANIFEST_NAME. Зі store
+        (ContentStore) файли бібліотечних юнітів стають посиланнями на
+        спільне сховище. Повертає лічильники written, skipped, deleted.
+        """
+        with self._phase('save'):
+            stats = self._save_to_files(Path(output_dir), incremental, store)
+        self._log(f"\n✅ Екстракція завершена!")
+        return stats
     
-    def save_to_files(self, output_dir):
-        """Зберегти витягнуті дані у структуру файлів"""
-        output_path = Path(output_dir)
+    def _save_to_files(self, output_path, incremental, store=None):
+        """Збереження без вимірювання"""
         output_path.mkdir(parents=True, exist_ok=True)
         
-        print(f"\n📁 Збереження у: {output_path}")
+        self._log(f"\n📁 Збереження у: {output_path}")
         
         # Створити структуру каталогів
         (output_path / 'FunctionBlocks').mkdir(exist_ok=True)
         (output_path / 'DataTypes').mkdir(exist_ok=True)
         (output_path / 'Functions').mkdir(exist_ok=True)
         (output_path / 'Programs').mkdir(exist_ok=True)
+        (output_path / 'Variables').mkdir(exist_ok=True)
         
-        # Зберегти інформацію про проект
-        self._save_project_info(output_path)
+        partial = self.filters is not None
+        old_manifest = self._load_manifest(output_path) if incremental or partial else {}
+        # З фільтром --only витягнута лише частина проекту: записи маніфесту
+        # для інших юнітів зберігаються, і їхні файли не видаляються
+        manifest = dict(old_manifest) if partial else {}
+        previous = old_manifest if incremental else {}
+        written = skipped = 0
         
-        # Зберегти функціональні блоки
-        for fb in self.extracted_data['fb_sources']:
-            self._save_fb(fb, output_path / 'FunctionBlocks')
+        # Інформація про проект: хеш без позначки часу, щоб вона не
+        # робила файл "зміненим" при кожному запуску
+        digest = self._content_hash(self._render_project_info(timestamp=False))
+        manifest[PROJECT_INFO_NAME] = digest
+        if self._is_unchanged(output_path, PROJECT_INFO_NAME, digest, previous):
+            skipped += 1
+        else:
+            self._write_file(output_path, PROJECT_INFO_NAME, self._render_project_info())
+            written += 1
         
-        # Зберегти типи даних
-        for ddt in self.extracted_data['ddt_sources']:
-            self._save_ddt(ddt, output_path / 'DataTypes')
+        # Файли юнітів (FB, DDT, EF, DFB, програми)
+        for rel_path, content in self.iter_rendered_files():
+            digest = self._content_hash(content)
+            manifest[rel_path] = digest
+            if self._is_unchanged(output_path, rel_path, digest, previous):
+                skipped += 1
+                continue
+            if store is not None and store.accepts(rel_path):
+                if store.link(output_path / rel_path, digest, content):
+                    written += 1
+                else:
+                    skipped += 1
+                continue
+            self._write_file(output_path, rel_path, content)
+            written += 1
         
-        # Зберегти зовнішні функції
-        for ef in self.extracted_data['ef_sources']:
-            self._save_ef(ef, output_path / 'Functions')
+        # Видалити файли юнітів, яких більше немає
+        deleted = 0
+        for rel_path in old_manifest.keys() - manifest.keys():
+            stale = output_path / rel_path
+            if stale.is_file():
+                stale.unlink()
+                deleted += 1
         
-        # Зберегти DFB
-        for dfb in self.extracted_data['dfb_sources']:
-            self._save_dfb(dfb, output_path / 'FunctionBlocks')
+        if manifest != old_manifest:
+            self._write_file(output_path, MANIFEST_NAME,
+                             json.dumps(manifest, indent=1, sort_keys=True, ensure_ascii=False))
         
-        # Зберегти програми
-        for prog in self.extracted_data['programs']:
-            self._save_program(prog, output_path / 'Programs')
+        if incremental:
+            self._log(f"  ✓ Записано: {written}, без змін: {skipped}, видалено: {deleted}")
+        return {'written': written, 'skipped': skipped, 'deleted': deleted}
+    
+    def iter_rendered_files(self):
+        """Сформувати файли юнітів: (відносний шлях, вміст)"""
+        for _, _, rel_path, content in self._iter_rendered_units():
+            yield rel_path, content
+    
+    def _iter_rendered_units(self):
+        """Сформувати юніти: (ключ extracted_data, юніт, відносний шлях, вміст)"""
+        for key, unit, render in self._iter_unit_renderers():
+            for rel_path, content in render():
+                yield key, unit, rel_path, content
+    
+    def _iter_unit_renderers(self):
+        """(ключ extracted_data, юніт, render) - render() дає [(відносний шлях, вміст)]"""
+        for key, directory, method in OUTPUT_LAYOUT:
+            render = getattr(self, method)
+            for unit in self.extracted_data[key]:
+                yield key, unit, functools.partial(self._render_unit, render, directory, unit)
         
-        print(f"\n✅ Екстракція завершена!")
+        # Глобальні змінні: ST оголошення і CSV з тими ж даними
+        table = self.extracted_data['variables']
+        if len(table):
+            if self._variables_filtered():
+                st_name, csv_name = SELECTED_VARIABLES_ST, SELECTED_VARIABLES_CSV
+            else:
+                st_name, csv_name = GLOBAL_VARIABLES_ST, GLOBAL_VARIABLES_CSV
+            yield 'variables', table, lambda: [
+                (f"Variables/{st_name}", self._render_global_st(table)),
+                (f"Variables/{csv_name}", self._render_global_csv(table)),
+            ]
     
-    def _save_project_info(self, output_path):
-        """Зберегти інформацію про проект"""
-        info = self.extracted_data['project_info']
-        content = f"""(*
-===========================================
-PROJECT: {info.get('name', 'Unknown')}
-VERSION: {info.get('version', '0.0.0')}
-EXTRACTED: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-===========================================
-*)
-"""
-        with open(output_path / 'PROJECT_INFO.txt', 'w', encoding='utf-8') as f:
+    def _variables_filtered(self):
+        """Чи витягнута лише частина глобальних змінних (--only var:ШАБЛОН)"""
+        patterns = self.filters.get('dataBlock', ()) if self.filters is not None else ()
+        return bool(patterns) and '*' not in patterns
+    
+    def _render_unit(self, render, directory, unit):
+        """Файли одного юніта: [] або [(відносний шлях, вміст)]"""
+        rendered = render(unit)
+        if rendered is None:
+            return []
+        filename, content = rendered
+        return [(f"{directory}/{filename}", content)]
+    
+    def _load_manifest(self, output_path):
+        """Прочитати маніфест попереднього запуску"""
+        try:
+            with open(output_path / MANIFEST_NAME, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if isinstance(manifest, dict) else {}
+    
+    def _is_unchanged(self, output_path, rel_path, digest, old_manifest):
+        """Чи збігається файл з попереднім запуском"""
+        return old_manifest.get(rel_path) == digest and (output_path / rel_path).is_file()
+    
+    def _content_hash(self, content):
+        """Хеш вмісту файлу"""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    def _write_file(self, output_path, rel_path, content):
+        """Записати текстовий файл"""
+        target = output_path / rel_path
+        try:
+            if target.stat().st_nlink > 1:
+                # Посилання на спільне сховище: не змінювати інші копії
+                target.unlink()
+        except FileNotFoundError:
+            pass
+        with open(target, 'w', encoding='utf-8') as f:
             f.write(content)
+        if self.metrics is not None:
+            self.metrics.add_written(rel_path, len(content.encode('utf-8')))
     
-    def _save_fb(self, fb, output_path):
-        """Зберегти функціональний блок"""
-        if not fb['name']:
-            return
+    def _render_project_info(self, timestamp=True):
+        """Сформувати інформацію про проект"""
+        info = self.extracted_data['project_info']
+        lines = [
+            "(*",
+            "===========================================",
+            f"PROJECT: {info.get('name', 'Unknown')}",
+            f"VERSION: {info.get('version', '0.0.0')}",
+        ]
+        if timestamp:
+            lines.append(f"EXTRACTED: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        lines += ["===========================================", "*)", ""]
+        return '\n'.join(lines)
+    
+    def _render_fb(self, fb):
+        """Сформувати файл: функціональний блок"""
+        if not fb.name:
+            return None
         
-        filename = f"{fb['name']}.st"
+        filename = f"{fb.name}.st"
         content = []
         
         content.append(f"(* ======================================== *)")
-        content.append(f"(* FUNCTION BLOCK: {fb['name']} *)")
-        content.append(f"(* VERSION: {fb['version']} *)")
-        if fb['comment']:
-            content.append(f"(* {fb['comment']} *)")
+        content.append(f"(* FUNCTION BLOCK: {fb.name} *)")
+        content.append(f"(* VERSION: {fb.version} *)")
+        if fb.comment:
+            content.append(f"(* {fb.comment} *)")
         content.append(f"(* ======================================== *)\n")
         
-        # Вхідні параметри
-        if fb['input_parameters']:
-            content.append("(* INPUT PARAMETERS *)")
-            for var in fb['input_parameters']:
-                comment = f" (* {var['comment']} *)" if var['comment'] else ""
-                content.append(f"  {var['name']} : {var['type']};{comment}")
-            content.append("")
-        
-        # Вихідні параметри
-        if fb['output_parameters']:
-            content.append("(* OUTPUT PARAMETERS *)")
-            for var in fb['output_parameters']:
-                comment = f" (* {var['comment']} *)" if var['comment'] else ""
-                content.append(f"  {var['name']} : {var['type']};{comment}")
-            content.append("")
-        
-        # InOut параметри
-        if fb['inout_parameters']:
-            content.append("(* INOUT PARAMETERS *)")
-            for var in fb['inout_parameters']:
-                comment = f" (* {var['comment']} *)" if var['comment'] else ""
-                content.append(f"  {var['name']} : {var['type']};{comment}")
-            content.append("")
-        
-        # Приватні змінні
-        if fb['private_variables']:
-            content.append("(* PRIVATE VARIABLES *)")
-            for var in fb['private_variables']:
-                comment = f" (* {var['comment']} *)" if var['comment'] else ""
-                content.append(f"  {var['name']} : {var['type']};{comment}")
-            content.append("")
-        
-        # Публічні змінні
-        if fb['public_variables']:
-            content.append("(* PUBLIC VARIABLES *)")
-            for var in fb['public_variables']:
-                comment = f" (* {var['comment']} *)" if var['comment'] else ""
-                content.append(f"  {var['name']} : {var['type']};{comment}")
-            content.append("")
+        self._render_variables(content, "INPUT PARAMETERS", fb.input_parameters)
+        self._render_variables(content, "OUTPUT PARAMETERS", fb.output_parameters)
+        self._render_variables(content, "INOUT PARAMETERS", fb.inout_parameters)
+        self._render_variables(content, "PRIVATE VARIABLES", fb.private_variables)
+        self._render_variables(content, "PUBLIC VARIABLES", fb.public_variables)
         
         # Програми
-        for program in fb['programs']:
-            content.append(f"\n(* -------- PROGRAM: {program['name']} -------- *)")
-            if program['code']:
-                content.append(program['code'])
+        for program in fb.programs:
+            content.append(f"\n(* -------- PROGRAM: {program.name} -------- *)")
+            if program.code:
+                content.append(program.code)
             content.append("")
         
-        with open(output_path / filename, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(content))
+        return filename, '\n'.join(content)
     
-    def _save_ddt(self, ddt, output_path):
-        """Зберегти тип даних"""
-        if not ddt['name']:
-            return
+    def _render_variables(self, content, title, variables):
+        """Додати секцію змінних (якщо вона не порожня)"""
+        if variables:
+            content.append(f"(* {title} *)")
+            content.extend(self._variable_lines(variables))
+            content.append("")
+    
+    def _variable_lines(self, variables):
+        """Рядки оголошень змінних"""
+        return [
+            f"  {var.name} : {var.type};" + (f" (* {var.comment} *)" if var.comment else "")
+            for var in variables
+        ]
+    
+    def _render_global_st(self, table):
+        """Сформувати VAR_GLOBAL з глобальними змінними (відсортовано за ім'ям)"""
+        content = []
+        content.append(f"(* ======================================== *)")
+        content.append(f"(* GLOBAL VARIABLES: {len(table)} *)")
+        content.append(f"(* ======================================== *)\n")
+        content.append("VAR_GLOBAL")
+        for name, type_name, address, initial_value, comment in table.sorted_rows():
+            line = f"  {name}"
+            if address:
+                line += f" AT {address}"
+            line += f" : {type_name}"
+            if initial_value:
+                line += f" := {initial_value}"
+            line += ";"
+            if comment:
+                line += f" (* {comment} *)"
+            content.append(line)
+        content.append("END_VAR")
+        content.append("")
+        return '\n'.join(content)
+    
+    def _render_global_csv(self, table):
+        """Сформувати CSV з глобальними змінними (відсортовано за ім'ям)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(('name', 'type', 'address', 'initial_value', 'comment'))
+        writer.writerows(table.sorted_rows())
+        return buffer.getvalue()
+    
+    def _render_ddt(self, ddt):
+        """Сформувати файл: тип даних"""
+        if not ddt.name:
+            return None
         
-        filename = f"{ddt['name']}.ddt"
+        filename = f"{ddt.name}.ddt"
         content = []
         
         content.append(f"(* ======================================== *)")
-        content.append(f"(* DATA TYPE: {ddt['name']} *)")
-        content.append(f"(* VERSION: {ddt['version']} *)")
-        if ddt['comment']:
-            content.append(f"(* {ddt['comment']} *)")
+        content.append(f"(* DATA TYPE: {ddt.name} *)")
+        content.append(f"(* VERSION: {ddt.version} *)")
+        if ddt.comment:
+            content.append(f"(* {ddt.comment} *)")
         content.append(f"(* ======================================== *)\n")
         
-        content.append(f"TYPE {ddt['name']} :")
+        content.append(f"TYPE {ddt.name} :")
         content.append("STRUCT")
         
-        for var in ddt['structure']:
-            comment = f" (* {var['comment']} *)" if var['comment'] else ""
-            content.append(f"  {var['name']} : {var['type']};{comment}")
+        content.extend(self._variable_lines(ddt.structure))
         
         content.append("END_STRUCT;")
         content.append("END_TYPE")
         
-        with open(output_path / filename, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(content))
+        return filename, '\n'.join(content)
     
-    def _save_ef(self, ef, output_path):
-        """Зберегти зовнішню функцію"""
-        if not ef['name']:
-            return
+    def _render_ef(self, ef):
+        """Сформувати файл: зовнішню функцію"""
+        if not ef.name:
+            return None
         
-        filename = f"{ef['name']}.ef"
+        filename = f"{ef.name}.ef"
         content = []
         
         content.append(f"(* ======================================== *)")
-        content.append(f"(* EXTERNAL FUNCTION: {ef['name']} *)")
-        content.append(f"(* VERSION: {ef['version']} *)")
-        if ef['comment']:
-            content.append(f"(* {ef['comment']} *)")
+        content.append(f"(* EXTERNAL FUNCTION: {ef.name} *)")
+        content.append(f"(* VERSION: {ef.version} *)")
+        if ef.comment:
+            content.append(f"(* {ef.comment} *)")
         content.append(f"(* ======================================== *)\n")
         
-        # Вхідні параметри
-        if ef['input_parameters']:
-            content.append("(* INPUT PARAMETERS *)")
-            for var in ef['input_parameters']:
-                comment = f" (* {var['comment']} *)" if var['comment'] else ""
-                content.append(f"  {var['name']} : {var['type']};{comment}")
-            content.append("")
+        self._render_variables(content, "INPUT PARAMETERS", ef.input_parameters)
+        self._render_variables(content, "OUTPUT PARAMETERS", ef.output_parameters)
         
-        # Вихідні параметри
-        if ef['output_parameters']:
-            content.append("(* OUTPUT PARAMETERS *)")
-            for var in ef['output_parameters']:
-                comment = f" (* {var['comment']} *)" if var['comment'] else ""
-                content.append(f"  {var['name']} : {var['type']};{comment}")
-            content.append("")
-        
-        with open(output_path / filename, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(content))
+        return filename, '\n'.join(content)
     
-    def _save_dfb(self, dfb, output_path):
-        """Зберегти DFB блок"""
-        if not dfb['name']:
-            return
+    def _render_dfb(self, dfb):
+        """Сформувати файл: DFB блок"""
+        if not dfb.name:
+            return None
         
-        filename = f"{dfb['name']}_DFB.st"
+        filename = f"{dfb.name}_DFB.st"
         content = []
         
         content.append(f"(* ======================================== *)")
-        content.append(f"(* DFB: {dfb['name']} *)")
-        content.append(f"(* VERSION: {dfb['version']} *)")
-        if dfb['comment']:
-            content.append(f"(* {dfb['comment']} *)")
+        content.append(f"(* DFB: {dfb.name} *)")
+        content.append(f"(* VERSION: {dfb.version} *)")
+        if dfb.comment:
+            content.append(f"(* {dfb.comment} *)")
         content.append(f"(* ======================================== *)\n")
         
-        if dfb['code']:
-            content.append(dfb['code'])
+        if dfb.code:
+            content.append(dfb.code)
         
-        with open(output_path / filename, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(content))
+        return filename, '\n'.join(content)
     
-    def _save_program(self, prog, output_path):
-        """Зберегти програму"""
-        if not prog['name']:
-            return
+    def _render_program(self, prog):
+        """Сформувати файл: програму"""
+        if not prog.name:
+            return None
         
-        filename = f"{prog['name']}.st"
+        filename = f"{prog.name}.st"
         content = []
         
         content.append(f"(* ======================================== *)")
-        content.append(f"(* PROGRAM: {prog['name']} *)")
-        if prog.get('type'):
-            content.append(f"(* TYPE: {prog['type']} *)")
-        if prog.get('task'):
-            content.append(f"(* TASK: {prog['task']} *)")
-        if prog.get('section_order'):
-            content.append(f"(* SECTION ORDER: {prog['section_order']} *)")
-        if prog.get('comment'):
-            content.append(f"(* {prog['comment']} *)")
+        content.append(f"(* PROGRAM: {prog.name} *)")
+        if prog.type:
+            content.append(f"(* TYPE: {prog.type} *)")
+        if prog.task:
+            content.append(f"(* TASK: {prog.task} *)")
+        if prog.section_order:
+            content.append(f"(* SECTION ORDER: {prog.section_order} *)")
+        if prog.comment:
+            content.append(f"(* {prog.comment} *)")
         content.append(f"(* ======================================== *)\n")
         
-        if prog.get('code'):
-            content.append(prog['code'])
+        if prog.code:
+            content.append(prog.code)
         
-        with open(output_path / filename, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(content))
+        return filename, '\n'.join(content)
+
+
+def collect_units(xef_file):
+    """Один потоковий прохід: {(тип, ім'я): (хеш, вміст)}"""
+    extractor = XEFExtractor(xef_file, streaming=True)
+    extractor._extract_streaming()
+    units = {}
+    for key, unit, rel_path, content in extractor._iter_rendered_units():
+        if rel_path.endswith(GLOBAL_VARIABLES_CSV):
+            continue  # Ті самі дані, що й у VAR_GLOBAL
+        units[(UNIT_TYPES[key], unit.name)] = (extractor._content_hash(content), content)
+    return units
+
+
+def diff_units(old_units, new_units):
+    """Порівняти юніти за хешем: (додані, видалені, змінені) ключі"""
+    added = sorted(new_units.keys() - old_units.keys())
+    removed = sorted(old_units.keys() - new_units.keys())
+    modified = sorted(
+        key for key in old_units.keys() & new_units.keys()
+        if old_units[key][0] != new_units[key][0]
+    )
+    return added, removed, modified
+
+
+def diff_main(argv):
+    """Режим diff: порівняти юніти двох XEF/ZEF без запису файлів
+    
+    Код виходу як у diff: 0 - без змін, 1 - є зміни, 2 - помилка.
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"{Path(sys.argv[0]).name} diff",
+        description="Порівняти юніти двох XEF/ZEF файлів")
+    parser.add_argument('old_file', help="стара версія (XEF або ZEF)")
+    parser.add_argument('new_file', help="нова версія (XEF або ZEF)")
+    parser.add_argument('--summary', action='store_true',
+                        help="тільки перелік змін, без текстового diff")
+    args = parser.parse_args(argv)
+    
+    try:
+        old_units = collect_units(args.old_file)
+        new_units = collect_units(args.new_file)
+    except READ_ERRORS as e:
+        print(f"✗ Помилка читання файлу: {e}", file=sys.stderr)
+        return 2
+    
+    added, removed, modified = diff_units(old_units, new_units)
+    
+    for title, sign, keys in (("Додано", '+', added),
+                              ("Видалено", '-', removed),
+                              ("Змінено", '~', modified)):
+        if keys:
+            print(f"{title} ({len(keys)}):")
+            for unit_type, name in keys:
+                print(f"  {sign} {unit_type} {name}")
+    
+    if not args.summary:
+        for unit_type, name in modified:
+            key = (unit_type, name)
+            for line in difflib.unified_diff(
+                    old_units[key][1].splitlines(),
+                    new_units[key][1].splitlines(),
+                    fromfile=f"a/{unit_type}/{name}",
+                    tofile=f"b/{unit_type}/{name}",
+                    lineterm=''):
+                print(line)
+    
+    if not (added or removed or modified):
+        print("✓ Відмінностей немає")
+        return 0
+    return 1
+
+
+def write_jsonl(extractor, target, log):
+    """Режим --jsonl: записати юніти у файл або stdout ('-')"""
+    log("\n🔍 Екстракція у JSON Lines...")
+    try:
+        if target == '-':
+            count = extractor.write_jsonl(sys.stdout)
+        else:
+            with open(target, 'w', encoding='utf-8') as f:
+                count = extractor.write_jsonl(f)
+    except BrokenPipeError:
+        # Споживач прочитав скільки треба; не друкувати traceback при виході
+        sys.stdout = None
+        return
+    if count is None:
+        print(f"✗ Помилка читання файлу: {extractor.error}", file=sys.stderr)
+        sys.exit(1)
+    log(f"✅ Записано юнітів: {count}" + ("" if target == '-' else f" у {target}"))
+
+
+def write_metrics_report(metrics, args, extractor, log):
+    """Записати звіт --metrics (якщо увімкнено)"""
+    if metrics is None:
+        return
+    report = metrics.to_dict()
+    report['file'] = str(args.xef_file)
+    report['streaming'] = args.stream
+    report['backend'] = extractor.backend.name
+    with open(args.metrics, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    log(f"📊 Метрики: {args.metrics}")
 
 
 def main():
     """Головна функція"""
-    print("=" * 60)
-    print("  XEF CODE EXTRACTOR - Екстрактор коду Unity Pro/Control Expert")
-    print("=" * 60)
-    
-    if len(sys.argv) < 2:
-        print("\nВикористання:")
-        print(f"  python {sys.argv[0]} <шлях_до_XEF_файлу> [вихідна_папка]")
-        print("\nПриклад:")
-        print(f"  python {sys.argv[0]} unitpro.xef")
-        print(f"  python {sys.argv[0]} unitpro.xef extracted_code")
-        sys.exit(1)
+    if sys.argv[1:2] == ['diff']:
+        sys.exit(diff_main(sys.argv[2:]))
+    if sys.argv[1:2] == ['normalize']:
+        from xef_normalize import main as normalize_main
+        sys.exit(normalize_main(sys.argv[2:]))
     
-    xef_file = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description="Екстрактор коду Unity Pro/Control Expert",
+        epilog=f"Приклад: python {sys.argv[0]} unitpro.xef extracted_code\n"
+               f"Порівняння версій: python {sys.argv[0]} diff old.ZEF new.ZEF\n"
+               f"Нормалізація XEF: python {sys.argv[0]} normalize unitpro.xef -o clean.xef",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('xef_file', help="шлях до XEF файлу або архіву ZEF")
+    parser.add_argument('output_dir', nargs='?', help="вихідна папка (за замовчуванням <ім'я>_extracted)")
+    parser.add_argument('--stream', action='store_true',
+                        help="потоковий режим (iterparse) для великих файлів")
+    parser.add_argument('--incremental', action='store_true',
+                        help="записувати тільки змінені файли, видаляти зниклі")
+    add_backend_argument(parser)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="розпарсити один великий файл у N процесах (блоки ділиться "
+                             "між процесами, результат той самий)")
+    parser.add_argument('--watch', action='store_true',
+                        help="відстежувати файл (або каталог з XEF/ZEF) і перевитягувати після "
+                             "кожної зміни; для каталогу output_dir - корінь результатів")
+    parser.add_argument('--only', action='append', metavar='KIND:GLOB',
+                        help="витягти тільки вибрані юніти, напр. fb:Valve* або program:MAIN "
+                             f"(види: {', '.join(UNIT_KINDS)}); можна повторювати")
+    parser.add_argument('--jsonl', metavar='FILE',
+                        help="замість дерева файлів писати юніти у JSON Lines "
+                             "(один об'єкт на рядок, '-' - stdout)")
+    parser.add_argument('--xref', action='store_true',
+                        help="записати перехресні посилання ST коду (XREF.csv) у вихідну папку")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="не виводити прогрес (тільки помилки)")
+    parser.add_argument('--metrics', metavar='JSON',
+                        help="записати метрики (час, пам'ять, лічильники) у JSON файл")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="для --metrics: вимірювати пік алокацій через tracemalloc")
+    args = parser.parse_args()
+    
+    # При --jsonl - прогрес іде у stderr, щоб не змішуватися з даними
+    to_stdout = args.jsonl == '-'
+    if args.quiet:
+        log = lambda message: None
+    elif to_stdout:
+        log = lambda message: print(message, file=sys.stderr)
+    else:
+        log = print
+    log("=" * 60)
+    log("  XEF CODE EXTRACTOR - Екстрактор коду Unity Pro/Control Expert")
+    log("=" * 60)
+    
+    xef_file = args.xef_file
     
     if not os.path.exists(xef_file):
-        print(f"\n✗ Файл не знайдено: {xef_file}")
+        print(f"\n✗ Файл не знайдено: {xef_file}", file=sys.stderr if args.quiet else sys.stdout)
         sys.exit(1)
     
+    if args.watch:
+        from xef_watch import ProjectWatcher
+        try:
+            parse_unit_filters(args.only or ())
+        except ValueError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            sys.exit(1)
+        if os.path.isdir(xef_file):
+            watcher = ProjectWatcher([xef_file], args.output_dir or '.', streaming=args.stream,
+                                     backend=args.backend, only=args.only, log=log)
+        else:
+            watcher = ProjectWatcher([xef_file], output_dir=args.output_dir, streaming=args.stream,
+                                     backend=args.backend, only=args.only, log=log)
+        watcher.run()
+        return
+    
     # Визначити вихідну папку
-    if len(sys.argv) >= 3:
-        output_dir = sys.argv[2]
+    if args.output_dir:
+        output_dir = args.output_dir
     else:
         base_name = Path(xef_file).stem
         output_dir = f"{base_name}_extracted"
     
     # Створити екстрактор
-    extractor = XEFExtractor(xef_file)
-    
-    # Парсинг
-    if not extractor.parse():
+    metrics = Metrics(trace_memory=args.trace_memory) if args.metrics else None
+    try:
+        if args.jobs > 1:
+            if args.jsonl or args.xref:
+                raise ValueError("--jobs не поєднується з --jsonl і --xref")
+            from xef_parallel import ParallelExtractor
+            extractor = ParallelExtractor(xef_file, jobs=args.jobs, quiet=args.quiet,
+                                          metrics=metrics, backend=args.backend, only=args.only)
+        else:
+            extractor = XEFExtractor(xef_file, streaming=args.stream, quiet=args.quiet or to_stdout,
+                                     metrics=metrics, backend=args.backend, only=args.only)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
         sys.exit(1)
     
-    # Екстракція
-    extractor.extract_all()
+    if args.jsonl:
+        write_jsonl(extractor, args.jsonl, log)
+        write_metrics_report(metrics, args, extractor, log)
+        return
+    
+    # Парсинг і екстракція
+    if not (extractor.parse() and extractor.extract_all()):
+        if args.quiet:
+            print(f"✗ Помилка читання файлу: {extractor.error}", file=sys.stderr)
+        sys.exit(1)
     
     # Збереження
-    extractor.save_to_files(output_dir)
+    extractor.save_to_files(output_dir, incremental=args.incremental)
+    if args.xref:
+        from xef_xref import XREF_CSV, write_xref
+        log(f"🔗 Перехресні посилання: {write_xref(extractor, output_dir)} → {XREF_CSV}")
+    
+    write_metrics_report(metrics, args, extractor, log)
     
-    print(f"\n📂 Результат збережено у: {Path(output_dir).absolute()}")
-    print("\n" + "=" * 60)
+    log(f"\n📂 Результат збережено у: {Path(output_dir).absolute()}")
+    log("\n" + "=" * 60)
 
 
 if __name__ == '__main__':
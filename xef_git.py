@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XEF Git Import - Історія архівних версій XEF/ZEF як потік git fast-import
+Один коміт на знімок проекту; blob записується тільки для змінених файлів
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from xef_backends import DEFAULT_BACKEND, ParseSpec, add_backend_argument
+from xef_batch import find_inputs
+from xef_extractor import PROJECT_INFO_NAME, READ_ERRORS, XEFExtractor
+
+
+DEFAULT_AUTHOR = 'XEF Extractor <xef-extractor@localhost>'
+
+# date_and_time#2024-1-14-15:13:24
+DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})-(\d{1,2}):(\d{1,2}):(\d{1,2})')
+
+
+def snapshot_date(xef_file):
+    """Дата знімка: dateTime з contentHeader або, якщо її немає, mtime файлу
+
+    Читається тільки початок файлу - contentHeader йде одним з перших.
+    """
+    extractor = XEFExtractor(xef_file, quiet=True)
+    try:
+        with extractor._open_source() as source:
+            for _, header in extractor.backend.iter_elements(source, ParseSpec(['contentHeader'])):
+                match = DATE_RE.search(header.get('dateTime', ''))
+                if match:
+                    return datetime(*map(int, match.groups()))
+                break
+    except READ_ERRORS:
+        pass  # Дата з mtime; помилку читання покаже екстракція
+    return datetime.fromtimestamp(Path(xef_file).stat().st_mtime)
+
+
+class FastImportWriter:
+    """Формує потік git fast-import зі знімків проекту
+
+    Пам'ятає хеш кожного файлу попереднього знімка: незмінені файли не
+    потрапляють у потік, змінені і нові дають blob і M, зниклі - D.
+    Однаковий вміст (наприклад повернення до старої версії) використовує
+    вже записаний blob.
+
+    З append=True перший коміт продовжує існуючу гілку (from) і спочатку
+    видаляє вміст prefix (або все дерево без prefix): стан гілки до імпорту
+    невідомий, тому перший знімок записується повністю, а інші файли
+    гілки (наприклад інші установки) не змінюються.
+    """
+
+    def __init__(self, stream, branch='main', author=DEFAULT_AUTHOR, prefix='', append=False):
+        self.stream = stream
+        self.ref = f"refs/heads/{branch}"
+        self.author = author
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.append = append
+        self.files = {}    # шлях -> хеш вмісту в останньому коміті
+        self.blobs = {}    # хеш вмісту -> марка blob
+        self.mark = 0
+        self.commits = 0
+
+    def _write(self, *parts):
+        for part in parts:
+            self.stream.write(part.encode('utf-8') if isinstance(part, str) else part)
+
+    def _data(self, payload):
+        self._write(f"data {len(payload)}\n", payload, "\n")
+
+    def _next_mark(self):
+        self.mark += 1
+        return self.mark
+
+    def commit(self, files, when, message):
+        """Записати коміт знімка; files - {шлях: вміст}. Повертає (змінено, видалено)"""
+        changes = []
+        current = {}
+        for rel_path, content in files.items():
+            payload = content.encode('utf-8')
+            digest = hashlib.sha256(payload).hexdigest()
+            current[rel_path] = digest
+            if self.files.get(rel_path) == digest:
+                continue
+            mark = self.blobs.get(digest)
+            if mark is None:
+                mark = self.blobs[digest] = self._next_mark()
+                self._write("blob\n", f"mark :{mark}\n")
+                self._data(payload)
+            changes.append(f"M 100644 :{mark} {self.prefix}{rel_path}\n")
+        deleted = sorted(self.files.keys() - current.keys())
+        changes += [f"D {self.prefix}{rel_path}\n" for rel_path in deleted]
+
+        when = when.astimezone()
+        signature = f"{self.author} {int(when.timestamp())} {when.strftime('%z')}"
+        self._write(f"commit {self.ref}\n", f"mark :{self._next_mark()}\n",
+                    f"author {signature}\n", f"committer {signature}\n")
+        self._data(message.encode('utf-8'))
+        if self.append and not self.commits:
+            # Продовжити існуючу гілку; видалення має йти перед M
+            self._write(f"from {self.ref}^0\n",
+                        f"D {self.prefix.rstrip('/')}\n" if self.prefix else "deleteall\n")
+        self._write(*sorted(changes), "\n")
+        self.files = current
+        self.commits += 1
+        return len(changes) - len(deleted), len(deleted)
+
+    def progress(self, message):
+        """Повідомлення, яке git fast-import друкує під час імпорту"""
+        self._write(f"progress {message}\n\n")
+
+
+def snapshot_files(xef_file, backend=DEFAULT_BACKEND):
+    """Файли знімка {шлях: вміст} і інформація про проект
+
+    PROJECT_INFO без позначки часу екстракції, щоб він змінювався тільки
+    разом з версією проекту.
+    """
+    extractor = XEFExtractor(xef_file, streaming=True, quiet=True, backend=backend)
+    if not (extractor.parse() and extractor.extract_all()):
+        raise ValueError(extractor.error)
+    files = {PROJECT_INFO_NAME: extractor._render_project_info(timestamp=False)}
+    files.update(extractor.iter_rendered_files())
+    return files, extractor.extracted_data['project_info']
+
+
+def main():
+    """Головна функція"""
+    parser = argparse.ArgumentParser(
+        description="Потік git fast-import з архівних знімків XEF/ZEF (один коміт на знімок)",
+        epilog="Приклад: python3 xef_git.py archive/ | git -C plant-repo fast-import",
+    )
+    parser.add_argument('inputs', nargs='+', help="XEF/ZEF файли або каталоги з ними")
+    parser.add_argument('-o', '--output', default='-',
+                        help="файл потоку (за замовчуванням '-' - stdout)")
+    parser.add_argument('--order', choices=('date', 'name'), default='date',
+                        help="порядок комітів: дата з contentHeader (або mtime) чи ім'я файлу")
+    parser.add_argument('--branch', default='main', help="гілка (за замовчуванням main)")
+    parser.add_argument('--author', default=DEFAULT_AUTHOR,
+                        help=f"автор комітів (за замовчуванням '{DEFAULT_AUTHOR}')")
+    parser.add_argument('--prefix', default='',
+                        help="підкаталог у репозиторії (наприклад назва установки)")
+    parser.add_argument('--append', action='store_true',
+                        help="продовжити існуючу гілку замість нової історії "
+                             "(друга установка з --prefix, нові знімки)")
+    add_backend_argument(parser)
+    args = parser.parse_args()
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print("✗ XEF/ZEF файли не знайдено", file=sys.stderr)
+        sys.exit(1)
+
+    # Прогрес у stderr: stdout - це потік для git fast-import
+    log = lambda message: print(message, file=sys.stderr)
+    dates = {path: snapshot_date(path) for path in inputs}
+    if args.order == 'date':
+        inputs.sort(key=lambda path: (dates[path], path.name))
+    else:
+        inputs.sort(key=lambda path: path.name)
+
+    started = time.perf_counter()
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    failed = 0
+    try:
+        writer = FastImportWriter(output, args.branch, args.author, args.prefix, args.append)
+        for number, path in enumerate(inputs, 1):
+            try:
+                files, info = snapshot_files(path, args.backend)
+            except READ_ERRORS as e:
+                failed += 1
+                log(f"  ✗ {path.name}: {e}")
+                continue
+            message = (f"{info.get('name', path.stem)} {info.get('version', '')}".strip()
+                       + f"\n\nЗнімок: {path.name}\n")
+            changed, deleted = writer.commit(files, dates[path], message)
+            writer.progress(f"{number}/{len(inputs)} {path.name}")
+            log(f"  ✓ {dates[path]:%Y-%m-%d %H:%M} {path.name}: змінено {changed}, видалено {deleted}")
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        else:
+            output.flush()
+
+    log(f"\n✅ Комітів: {writer.commits}  ❌ Помилок: {failed}"
+        f"  ⏱ {time.perf_counter() - started:.2f} с")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
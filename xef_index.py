@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XEF Index - SQLite індекс юнітів, змінних і коду багатьох проектів
+Відповідає на питання "які проекти використовують FB X" або "де оголошена
+змінна Y" за мілісекунди замість grep по деревах екстракції
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from xef_backends import DEFAULT_BACKEND, add_backend_argument
+from xef_batch import find_inputs, project_names
+from xef_extractor import (FunctionBlock, GlobalVariable, READ_ERRORS, UNIT_KINDS, UNIT_TYPES,
+                           VARIABLE_FIELDS, XEFExtractor)
+
+
+DEFAULT_DB = 'xef_index.db'
+
+# Кількість рядків в одному executemany
+BATCH_SIZE = 1000
+
+# Ключі extracted_data, що індексуються
+INDEXED_KEYS = ('fb_sources', 'ddt_sources', 'ef_sources', 'dfb_sources', 'programs', 'variables')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    file TEXT NOT NULL,
+    imported TEXT NOT NULL,
+    units INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(id),
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT,
+    comment TEXT
+);
+-- unit_id NULL - глобальна змінна проекту (dataBlock)
+CREATE TABLE IF NOT EXISTS variables (
+    project_id INTEGER NOT NULL REFERENCES projects(id),
+    unit_id INTEGER REFERENCES units(id),
+    section TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT,
+    comment TEXT,
+    initial_value TEXT,
+    address TEXT
+);
+CREATE TABLE IF NOT EXISTS code (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(id),
+    unit_id INTEGER NOT NULL REFERENCES units(id),
+    section TEXT,
+    language TEXT
+);
+-- Текст коду зберігається тільки в FTS таблиці (rowid = code.id);
+-- '_' - частина ідентифікатора ST
+CREATE VIRTUAL TABLE IF NOT EXISTS code_fts USING fts5(
+    code, tokenize = "unicode61 tokenchars '_'"
+);
+CREATE INDEX IF NOT EXISTS units_name ON units(name);
+CREATE INDEX IF NOT EXISTS units_project ON units(project_id);
+CREATE INDEX IF NOT EXISTS variables_name ON variables(name);
+CREATE INDEX IF NOT EXISTS variables_type ON variables(type);
+CREATE INDEX IF NOT EXISTS variables_project ON variables(project_id);
+CREATE INDEX IF NOT EXISTS code_project ON code(project_id);
+"""
+
+
+def connect(db_path):
+    """Відкрити (і за потреби створити) базу індексу"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class BatchWriter:
+    """Накопичує рядки і вставляє їх пакетами через executemany"""
+
+    def __init__(self, conn, sql):
+        self.conn = conn
+        self.sql = sql
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.conn.executemany(self.sql, self.rows)
+            self.rows = []
+
+
+def delete_project_rows(conn, project_id):
+    """Видалити всі рядки проекту (крім запису в projects)"""
+    conn.execute("DELETE FROM code_fts WHERE rowid IN (SELECT id FROM code WHERE project_id = ?)",
+                 (project_id,))
+    for table in ('code', 'variables', 'units'):
+        conn.execute(f"DELETE FROM {table} WHERE project_id = ?", (project_id,))
+
+
+def import_project(conn, xef_file, name=None, backend=DEFAULT_BACKEND):
+    """Завантажити проект в індекс, замінивши тільки його попередні рядки
+
+    Юніти читаються потоковим ітератором екстрактора. Все виконується
+    в одній транзакції: при помилці читання індекс проекту не змінюється.
+    Повертає кількість юнітів.
+    """
+    xef_file = Path(xef_file)
+    name = name or xef_file.stem
+    extractor = XEFExtractor(xef_file, quiet=True, backend=backend)
+
+    with conn:
+        conn.execute(
+            "INSERT INTO projects (name, file, imported) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET file = excluded.file, imported = excluded.imported",
+            (name, str(xef_file.resolve()), datetime.now().isoformat(timespec='seconds')))
+        project_id = conn.execute("SELECT id FROM projects WHERE name = ?", (name,)).fetchone()[0]
+        delete_project_rows(conn, project_id)
+
+        # Ідентифікатори призначаються тут, щоб зв'язати змінні й код
+        # з юнітом без lastrowid після кожної вставки
+        unit_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM units").fetchone()[0]
+        code_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM code").fetchone()[0]
+        units = BatchWriter(conn, "INSERT INTO units VALUES (?, ?, ?, ?, ?, ?)")
+        variables = BatchWriter(conn, "INSERT INTO variables VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+        code = BatchWriter(conn, "INSERT INTO code VALUES (?, ?, ?, ?, ?)")
+        code_text = BatchWriter(conn, "INSERT INTO code_fts (rowid, code) VALUES (?, ?)")
+
+        count = 0
+        for key, unit in extractor.iter_units(INDEXED_KEYS):
+            if isinstance(unit, GlobalVariable):
+                variables.add((project_id, None, 'global', unit.name, unit.type,
+                               unit.comment, unit.initial_value, unit.address))
+                continue
+
+            unit_id += 1
+            count += 1
+            units.add((unit_id, project_id, UNIT_TYPES[key], unit.name,
+                       getattr(unit, 'version', None), unit.comment))
+            for field in VARIABLE_FIELDS:
+                for var in getattr(unit, field, None) or ():
+                    variables.add((project_id, unit_id, field, var.name, var.type,
+                                   var.comment, var.initial_value, None))
+
+            if isinstance(unit, FunctionBlock):
+                sections = [(section.name, section.language, section.code)
+                            for section in unit.programs]
+            elif getattr(unit, 'code', None):
+                sections = [(unit.name, unit.language, unit.code)]
+            else:
+                sections = []
+            for section, language, text in sections:
+                code_id += 1
+                code.add((code_id, project_id, unit_id, section, language))
+                code_text.add((code_id, text or ''))
+
+        for writer in (units, variables, code, code_text):
+            writer.flush()
+        conn.execute("UPDATE projects SET units = ? WHERE id = ?", (count, project_id))
+    return count
+
+
+def index_owner(conn):
+    """owner для project_names: абсолютний шлях файлу проекту з індексу"""
+    def owner(name):
+        row = conn.execute("SELECT file FROM projects WHERE name = ?", (name,)).fetchone()
+        return str(Path(row[0]).resolve()) if row else None
+    return owner
+
+
+def print_rows(headers, rows):
+    """Надрукувати рядки вирівняною таблицею"""
+    rows = [['' if value is None else ' '.join(str(value).splitlines()) for value in row]
+            for row in rows]
+    widths = [max([len(h)] + [len(row[i]) for row in rows]) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)).rstrip())
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(value.ljust(w) for value, w in zip(row, widths)).rstrip())
+
+
+def cmd_import(conn, args):
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print("✗ XEF/ZEF файли не знайдено")
+        return 1
+    if args.project and len(inputs) > 1:
+        print("✗ --project можна вказати тільки для одного файлу")
+        return 1
+    # Проект, що вже є в індексі, зберігає своє ім'я (за шляхом файлу) незалежно
+    # від інших файлів імпорту; однакові імена файлів з різних каталогів
+    # (unitpro.xef) не замінюють один одного
+    try:
+        names = ({inputs[0]: args.project} if args.project
+                 else project_names(inputs, index_owner(conn)))
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+
+    failed = 0
+    for xef_file in inputs:
+        started = time.perf_counter()
+        try:
+            count = import_project(conn, xef_file, names[xef_file], args.backend)
+        except READ_ERRORS as e:
+            failed += 1
+            print(f"  ✗ {xef_file}: {e}")
+            continue
+        print(f"  ✓ {xef_file} → {names[xef_file]}: {count} юн. "
+              f"({time.perf_counter() - started:.2f} с)")
+    print(f"\n✅ Імпортовано: {len(inputs) - failed}  ❌ Помилок: {failed}")
+    return 1 if failed else 0
+
+
+def cmd_projects(conn, args):
+    return conn.execute(
+        "SELECT name, units, imported, file FROM projects ORDER BY name"
+    ), ('project', 'units', 'imported', 'file')
+
+
+def cmd_unit(conn, args):
+    sql = ("SELECT p.name, u.type, u.name, u.version, u.comment FROM units u "
+           "JOIN projects p ON p.id = u.project_id WHERE u.name GLOB ?")
+    params = [args.name]
+    if args.kind:
+        sql += " AND u.type = ?"
+        params.append(UNIT_KINDS[args.kind])
+    return conn.execute(sql + " ORDER BY p.name, u.name", params), \
+        ('project', 'type', 'name', 'version', 'comment')
+
+
+def cmd_uses(conn, args):
+    return conn.execute(
+        "SELECT p.name, COALESCE(u.name, '<global>'), v.section, v.name, v.type FROM variables v "
+        "JOIN projects p ON p.id = v.project_id LEFT JOIN units u ON u.id = v.unit_id "
+        "WHERE v.type GLOB ? ORDER BY p.name, u.name, v.name", (args.type,)
+    ), ('project', 'unit', 'section', 'variable', 'type')
+
+
+def cmd_var(conn, args):
+    return conn.execute(
+        "SELECT p.name, COALESCE(u.type, 'dataBlock'), COALESCE(u.name, '<global>'), v.section, "
+        "v.name, v.type, v.address, v.comment FROM variables v "
+        "JOIN projects p ON p.id = v.project_id LEFT JOIN units u ON u.id = v.unit_id "
+        "WHERE v.name GLOB ? ORDER BY p.name, u.name", (args.name,)
+    ), ('project', 'unit type', 'unit', 'section', 'variable', 'type', 'address', 'comment')
+
+
+def cmd_code(conn, args):
+    return conn.execute(
+        "SELECT p.name, u.type, u.name, c.section, c.language, "
+        "snippet(code_fts, 0, '[', ']', '…', 8) FROM code_fts "
+        "JOIN code c ON c.id = code_fts.rowid JOIN units u ON u.id = c.unit_id "
+        "JOIN projects p ON p.id = c.project_id "
+        "WHERE code_fts MATCH ? ORDER BY rank LIMIT ?", (args.query, args.limit)
+    ), ('project', 'type', 'unit', 'section', 'lang', 'match')
+
+
+def cmd_remove(conn, args):
+    row = conn.execute("SELECT id FROM projects WHERE name = ?", (args.project,)).fetchone()
+    if row is None:
+        print(f"✗ Проект не знайдено: {args.project}")
+        return 1
+    with conn:
+        delete_project_rows(conn, row[0])
+        conn.execute("DELETE FROM projects WHERE id = ?", (row[0],))
+    print(f"✓ Проект видалено: {args.project}")
+    return 0
+
+
+def main():
+    """Головна функція"""
+    parser = argparse.ArgumentParser(
+        description="SQLite індекс юнітів, змінних і коду XEF/ZEF проектів")
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help=f"файл бази (за замовчуванням {DEFAULT_DB})")
+    # required= у add_subparsers є тільки з Python 3.7
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    command = commands.add_parser('import', help="додати або оновити проекти в індексі")
+    command.add_argument('inputs', nargs='+', help="XEF/ZEF файли або каталоги з ними")
+    command.add_argument('--project', help="ім'я проекту (за замовчуванням - ім'я файлу)")
+    add_backend_argument(command)
+    command.set_defaults(handler=cmd_import)
+
+    command = commands.add_parser('projects', help="проекти в індексі")
+    command.set_defaults(handler=cmd_projects)
+
+    command = commands.add_parser('unit', help="де є юніт з таким ім'ям (glob)")
+    command.add_argument('name')
+    command.add_argument('--kind', choices=[k for k in UNIT_KINDS if k != 'var'],
+                         help="тільки юніти цього виду")
+    command.set_defaults(handler=cmd_unit)
+
+    command = commands.add_parser('uses', help="де використовується тип (FB, DDT), напр. TON")
+    command.add_argument('type')
+    command.set_defaults(handler=cmd_uses)
+
+    command = commands.add_parser('var', help="де оголошена змінна (glob)")
+    command.add_argument('name')
+    command.set_defaults(handler=cmd_var)
+
+    command = commands.add_parser('code', help="повнотекстовий пошук у коді (синтаксис FTS5)")
+    command.add_argument('query')
+    command.add_argument('--limit', type=int, default=50)
+    command.set_defaults(handler=cmd_code)
+
+    command = commands.add_parser('remove', help="видалити проект з індексу")
+    command.add_argument('project')
+    command.set_defaults(handler=cmd_remove)
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+    try:
+        started = time.perf_counter()
+        try:
+            result = args.handler(conn, args)
+        except sqlite3.OperationalError as e:
+            print(f"✗ Помилка запиту: {e}")
+            sys.exit(2)
+        if isinstance(result, int):
+            sys.exit(result)
+        cursor, headers = result
+        rows = cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        if rows:
+            print_rows(headers, rows)
+        print(f"\n{len(rows)} рядків, {elapsed:.1f} мс")
+        sys.exit(0 if rows else 1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XEF Normalizer - Канонічний XEF без шуму для контролю версій
+Обнуляє timestamps, GUID'и, checksums та HexValues і впорядковує атрибути,
+зберігаючи решту файлу (IOConf тощо). Потокова обробка, пам'ять не залежить
+від розміру файлу
+"""
+
+import argparse
+import filecmp
+import os
+import re
+import shutil
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from xml.parsers import expat
+
+from xef_backends import CHUNK_SIZE
+from xef_extractor import READ_ERRORS, XEFExtractor
+
+
+# Змінні атрибути (ім'я у нижньому регістрі) -> які символи обнуляються.
+# Кожна група цифр замінюється одним 0, щоб і довжина значення не змінювалась
+# між збереженнями (2024-1-9 і 2024-12-19 дають однаковий результат)
+DIGITS = re.compile(r'\d+')
+HEX_DIGITS = re.compile(r'[0-9A-Fa-f]+')
+VOLATILE_ATTRIBUTES = {
+    'datetime': DIGITS,
+    'guid': HEX_DIGITS,
+    'checksum': HEX_DIGITS,
+    'crc': HEX_DIGITS,
+    'hexvalue': HEX_DIGITS,
+}
+
+# <attribute name="TypeCodeCheckSumString" value="..."> - обнуляється value
+VOLATILE_ATTRIBUTE_NAMES = re.compile(r'checksum|signature|crc|guid', re.I)
+
+# Елементи, текст яких відкидається
+VOLATILE_ELEMENTS = frozenset(('hexvalue',))
+
+# Розмір буфера виводу (кількість фрагментів перед записом)
+FLUSH_EVERY = 4096
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+
+# Символи, що потребують екранування (перевірка дешевша за replace)
+TEXT_SPECIAL = re.compile(r'[&<>]')
+ATTRIBUTE_SPECIAL = re.compile(r'[&<"\n\r\t]')
+
+
+def escape_text(text):
+    if TEXT_SPECIAL.search(text) is None:
+        return text
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def escape_attribute(value):
+    if ATTRIBUTE_SPECIAL.search(value) is None:
+        return value
+    return (value.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;')
+            .replace('\n', '&#10;').replace('\r', '&#13;').replace('\t', '&#9;'))
+
+
+class XEFNormalizer:
+    """Обробник подій expat, що пише канонічний XEF у текстовий потік
+
+    Атрибути сортуються за іменем, у значеннях змінних атрибутів кожна
+    група цифр замінюється на 0 (роздільники зберігаються), текст змінних елементів
+    відкидається. Решта - текст, коментарі, секції CDATA - переноситься без
+    змін, тому пам'ять обмежена буфером виводу.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.parts = []
+        self._emit = self.parts.append
+        self.skip_text = 0     # глибина всередині змінних елементів
+        self.in_cdata = False
+        self.zeroed = 0        # скільки значень обнулено
+
+    def flush(self):
+        self.out.write(''.join(self.parts))
+        self.parts.clear()
+
+    def _normalize_attributes(self, tag, attrib):
+        """Атрибути у стабільному порядку з обнуленими змінними значеннями"""
+        pairs = dict(zip(attrib[::2], attrib[1::2]))
+        if tag == 'attribute' and VOLATILE_ATTRIBUTE_NAMES.search(pairs.get('name', '')):
+            if 'value' in pairs:
+                self._zero(pairs, 'value', HEX_DIGITS)
+        for name in pairs:
+            rule = VOLATILE_ATTRIBUTES.get(name.lower())
+            if rule is not None:
+                self._zero(pairs, name, rule)
+        return sorted(pairs.items())
+
+    def _zero(self, pairs, name, rule):
+        value = rule.sub('0', pairs[name])
+        if value != pairs[name]:
+            pairs[name] = value
+            self.zeroed += 1
+
+    def xml_decl(self, version, encoding, standalone):
+        # Вихід завжди UTF-8, незалежно від кодування входу
+        self._emit(XML_DECLARATION)
+
+    def start(self, tag, attrib):
+        attributes = ''.join(f' {name}="{escape_attribute(value)}"'
+                             for name, value in self._normalize_attributes(tag, attrib))
+        self._emit(f'<{tag}{attributes}>')
+        if self.skip_text or tag.lower() in VOLATILE_ELEMENTS:
+            self.skip_text += 1
+
+    def end(self, tag):
+        self._emit(f'</{tag}>')
+        if self.skip_text:
+            self.skip_text -= 1
+        if len(self.parts) >= FLUSH_EVERY:
+            self.flush()
+
+    def data(self, text):
+        if self.skip_text:
+            if text.strip():
+                self.zeroed += 1
+            return
+        self._emit(text if self.in_cdata else escape_text(text))
+
+    def start_cdata(self):
+        self.in_cdata = True
+        if not self.skip_text:
+            self._emit('<![CDATA[')
+
+    def end_cdata(self):
+        self.in_cdata = False
+        if not self.skip_text:
+            self._emit(']]>')
+
+    def comment(self, text):
+        self._emit(f'<!--{text}-->')
+
+    def processing_instruction(self, target, data):
+        self._emit(f'<?{target} {data}?>')
+
+
+def normalize(source, out):
+    """Нормалізувати XEF з бінарного потоку source у текстовий потік out
+
+    Повертає кількість змінених (обнулених) значень.
+    """
+    normalizer = XEFNormalizer(out)
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.ordered_attributes = True
+    parser.XmlDeclHandler = normalizer.xml_decl
+    parser.StartElementHandler = normalizer.start
+    parser.EndElementHandler = normalizer.end
+    parser.CharacterDataHandler = normalizer.data
+    parser.CommentHandler = normalizer.comment
+    parser.StartCdataSectionHandler = normalizer.start_cdata
+    parser.EndCdataSectionHandler = normalizer.end_cdata
+    parser.ProcessingInstructionHandler = normalizer.processing_instruction
+    try:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            parser.Parse(chunk, not chunk)
+            if not chunk:
+                break
+    except expat.ExpatError as e:
+        raise ET.ParseError(str(e)) from e
+    normalizer.flush()
+    out.write('\n')
+    return normalizer.zeroed
+
+
+def normalize_file(xef_file, output_file):
+    """Нормалізувати XEF (або XEF з архіву ZEF) у файл; повертає кількість обнулень
+
+    Запис іде у тимчасовий файл поруч з output_file і замінює його тільки
+    після успішного завершення, тому output_file може збігатися з xef_file.
+    """
+    output_file = Path(output_file)
+    extractor = XEFExtractor(xef_file, quiet=True)
+    fd, tmp = tempfile.mkstemp(dir=output_file.parent, prefix=f".{output_file.name}.")
+    try:
+        # fd відкривається першим: файл закриється і при помилці відкриття джерела
+        with open(fd, 'w', encoding='utf-8', newline='\n') as out, \
+                extractor._open_source() as source:
+            zeroed = normalize(source, out)
+        # mkstemp створює файл з правами 0600: взяти права замінюваного
+        # файлу або звичайні права нового файлу
+        if output_file.exists():
+            shutil.copymode(output_file, tmp)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, output_file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return zeroed
+
+
+def main(argv=None):
+    """Головна функція"""
+    parser = argparse.ArgumentParser(
+        prog='xef_normalize.py',
+        description="Канонічний XEF: обнулені timestamps/GUID/checksums/HexValues, "
+                    "відсортовані атрибути; решта файлу зберігається",
+        epilog="pre-commit: python3 xef_normalize.py --in-place $(git diff --cached --name-only -- '*.xef')",
+    )
+    parser.add_argument('inputs', nargs='+', help="XEF файли (або ZEF з -o)")
+    parser.add_argument('-o', '--output', help="вихідний XEF (тільки для одного входу, '-' - stdout)")
+    parser.add_argument('--in-place', action='store_true', help="перезаписати вхідні XEF")
+    parser.add_argument('--check', action='store_true',
+                        help="нічого не змінювати; код 1, якщо файл не нормалізований")
+    args = parser.parse_args(argv)
+
+    if sum(map(bool, (args.output, args.in_place, args.check))) != 1:
+        parser.error("потрібен рівно один з -o, --in-place, --check")
+    if args.output and len(args.inputs) > 1:
+        parser.error("-o можна вказати тільки для одного вхідного файлу")
+
+    status = 0
+    for xef_file in map(Path, args.inputs):
+        try:
+            if args.output == '-':
+                extractor = XEFExtractor(xef_file, quiet=True)
+                with extractor._open_source() as source:
+                    normalize(source, sys.stdout)
+                continue
+            if (args.in_place or args.check) and zipfile.is_zipfile(xef_file):
+                raise ValueError("ZEF не можна змінити на місці, використайте -o")
+            if args.check:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    normalized = Path(tmp_dir) / xef_file.name
+                    normalize_file(xef_file, normalized)
+                    if not filecmp.cmp(xef_file, normalized, shallow=False):
+                        print(f"✗ {xef_file}: не нормалізований", file=sys.stderr)
+                        status = 1
+                continue
+            zeroed = normalize_file(xef_file, args.output or xef_file)
+            print(f"✓ {xef_file}: обнулено значень {zeroed}", file=sys.stderr)
+        except READ_ERRORS as e:
+            print(f"✗ {xef_file}: {e}", file=sys.stderr)
+            status = 2
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
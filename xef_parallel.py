@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+XEF Parallel - Паралельна екстракція одного великого XEF файлу
+Межі блоків верхнього рівня знаходяться побайтовим скануванням, діапазони
+блоків парсяться і рендеряться у пулі процесів, результати зливаються в
+порядку файлу
+"""
+
+import functools
+import io
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from xef_extractor import OUTPUT_LAYOUT, READ_ERRORS, Metrics, XEFExtractor
+
+
+# Межі розміру пакета блоків для одного завдання воркера
+MIN_BATCH_BYTES = 1 << 20
+MAX_BATCH_BYTES = 64 << 20
+
+# Скільки пакетів на процес: дрібніші пакети краще вирівнюють навантаження
+BATCHES_PER_JOB = 8
+
+ROOT_TAG = b'FEFExchangeFile'
+
+
+def scan_blocks(data, tags, root=ROOT_TAG):
+    """Знайти блоки верхнього рівня: [(тег, початок, кінець)] у байтах
+
+    Шукається початковий тег з tags, потім його закриваючий тег; вміст
+    блоку не розбирається, тому сканування обмежене швидкістю find().
+    Коментарі та CDATA між блоками пропускаються. Блоки з однаковим
+    тегом не вкладаються один в одного (так влаштований XEF). Кореневий
+    елемент root має відкриватися до першого блоку і закриватися після
+    останнього - інакше файл обрізаний або це не XEF (ET.ParseError).
+    """
+    root_start = re.compile(rb'<!--.*?-->|<(' + re.escape(root) + rb')[\s>]', re.S)
+    position = 0
+    while True:
+        match = root_start.search(data, position)
+        if match is None:
+            raise ET.ParseError(f"немає кореневого елемента {root.decode()}")
+        position = match.end()
+        if match.group(1) is not None:
+            break
+
+    names = b'|'.join(re.escape(tag.encode('ascii')) for tag in sorted(tags))
+    pattern = re.compile(rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<(' + names + rb')[\s/>]', re.S)
+    blocks = []
+    while True:
+        match = pattern.search(data, position)
+        if match is None:
+            break
+        tag = match.group(1)
+        if tag is None:
+            position = match.end()
+            continue
+        start = match.start()
+        tag_end = data.find(b'>', match.end(1))
+        if tag_end < 0:
+            raise ET.ParseError(f"незакритий тег {tag.decode()} (байт {start})")
+        if data[tag_end - 1:tag_end] == b'/':
+            end = tag_end + 1
+        else:
+            close = b'</' + tag + b'>'
+            end = data.find(close, tag_end)
+            if end < 0:
+                raise ET.ParseError(f"немає {close.decode()} для блоку з байта {start}")
+            end += len(close)
+        blocks.append((tag.decode('ascii'), start, end))
+        position = end
+
+    if data.find(b'</' + root + b'>', position) < 0:
+        raise ET.ParseError(f"немає </{root.decode()}> після байта {position} (файл обрізаний?)")
+    return blocks
+
+
+def xml_declaration(data):
+    """XML декларація файлу (для кодування фрагментів) або b''"""
+    if data[:5] == b'<?xml':
+        end = data.find(b'?>')
+        if end > 0:
+            return bytes(data[:end + 2])
+    return b''
+
+
+def make_batches(blocks, jobs):
+    """Розбити блоки на послідовні пакети приблизно однакового розміру"""
+    total = sum(end - start for _, start, end in blocks)
+    target = min(MAX_BATCH_BYTES, max(MIN_BATCH_BYTES, total // max(1, jobs * BATCHES_PER_JOB)))
+    batches = []
+    batch = []
+    size = 0
+    for block in blocks:
+        batch.append(block)
+        size += block[2] - block[1]
+        if size >= target:
+            batches.append(batch)
+            batch = []
+            size = 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def extract_batch(source_path, declaration, backend, only, trace_memory, batch):
+    """Розпарсити і відрендерити пакет блоків (виконується у процесі пулу)
+
+    Повертає відрендерені файли юнітів по ключах extracted_data, кількість
+    юнітів, таблицю глобальних змінних, інформацію про проект і метрики
+    юнітів (trace_memory None - без метрик).
+    """
+    parts = [declaration, b'<', ROOT_TAG, b'>']
+    with open(source_path, 'rb') as f:
+        for _, start, end in batch:
+            f.seek(start)
+            parts.append(f.read(end - start))
+    parts += [b'</', ROOT_TAG, b'>']
+
+    metrics = None if trace_memory is None else Metrics(trace_memory=trace_memory)
+    extractor = XEFExtractor(source_path, quiet=True, metrics=metrics, backend=backend, only=only)
+    root = extractor.backend.parse(io.BytesIO(b''.join(parts)), extractor._parse_spec())
+    for element in root:
+        extractor._dispatch(element)
+
+    data = extractor.extracted_data
+    files = {key: [] for key, _, _ in OUTPUT_LAYOUT}
+    for key, _, rel_path, content in extractor._iter_rendered_units():
+        if key != 'variables':
+            files[key].append((rel_path, content))
+    return {
+        'files': files,
+        'counts': {key: len(data[key]) for key, _, _ in OUTPUT_LAYOUT},
+        'variables': data['variables'],
+        'project_info': data['project_info'],
+        'unit_types': metrics.unit_types if metrics is not None else {},
+    }
+
+
+class ParallelExtractor(XEFExtractor):
+    """Екстрактор, що розподіляє блоки одного XEF між процесами
+
+    parse() сканує межі блоків, extract_all() парсить і рендерить пакети
+    у пулі; save_to_files() записує готові файли в порядку, в якому їх
+    записав би послідовний екстрактор. Юніти не повертаються у головний
+    процес - у extracted_data є тільки інформація про проект і глобальні
+    змінні. Обробники з register_handler у воркерах не діють. Метрики
+    юнітів воркерів додаються до metrics (час - сума по процесах).
+    """
+
+    def __init__(self, xef_file_path, jobs=None, only=None, **kwargs):
+        super().__init__(xef_file_path, only=only, **kwargs)
+        self.jobs = jobs or os.cpu_count() or 1
+        # Фільтри --only передаються воркерам у вихідному вигляді
+        self.only = only
+        self.blocks = []
+        self.counts = {}
+        self.rendered = {}
+        self._source_path = None
+        self._declaration = b''
+        self._spool = None
+
+    def _parse(self):
+        """Знайти межі блоків (ZEF спочатку розпаковується у тимчасовий файл)"""
+        try:
+            self._source_path = self._prepare_source()
+            with open(self._source_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    raise ET.ParseError("порожній файл")
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self._declaration = xml_declaration(data)
+                    # Фільтр за видом діє вже тут, за іменем - у воркерах
+                    self.blocks = scan_blocks(data, self._parse_spec().top_tags)
+        except Exception as e:
+            self._cleanup()
+            return self._fail(e)
+        self._log(f"✓ Знайдено блоків: {len(self.blocks)} ({self.xef_file_path.name})")
+        return True
+
+    def _prepare_source(self):
+        """Шлях до XEF на диску; XEF з ZEF копіюється потоково у тимчасовий файл"""
+        if not zipfile.is_zipfile(self.xef_file_path):
+            return self.xef_file_path
+        with self._open_source() as source, \
+                tempfile.NamedTemporaryFile(suffix='.xef', delete=False) as spool:
+            shutil.copyfileobj(source, spool, 1 << 20)
+        self._spool = spool.name
+        return self._spool
+
+    def _cleanup(self):
+        if self._spool is not None:
+            os.unlink(self._spool)
+            self._spool = None
+
+    def extract_all(self):
+        """Розпарсити і відрендерити блоки у пулі процесів"""
+        self._log(f"\n🔍 Початок екстракції ({self.jobs} процесів)...")
+        self.rendered = {key: [] for key, _, _ in OUTPUT_LAYOUT}
+        self.counts = dict.fromkeys(self.rendered, 0)
+        batches = make_batches(self.blocks, self.jobs)
+        worker = functools.partial(extract_batch, self._source_path, self._declaration,
+                                   self.backend.name, self.only,
+                                   self.metrics.trace_memory if self.metrics is not None else None)
+        try:
+            with self._phase('extract'), ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                # map віддає результати в порядку пакетів, тобто в порядку файлу
+                for result in pool.map(worker, batches):
+                    for key, files in result['files'].items():
+                        self.rendered[key].extend(files)
+                        self.counts[key] += result['counts'][key]
+                    self.extracted_data['variables'].extend(result['variables'])
+                    if result['project_info']:
+                        self.extracted_data['project_info'].update(result['project_info'])
+                    if self.metrics is not None:
+                        self.metrics.merge_unit_types(result['unit_types'])
+        except READ_ERRORS as e:
+            return self._fail(e)
+        finally:
+            self._cleanup()
+
+        self._log(f"  ✓ Інформація про проект")
+        self._log(f"  ✓ Функціональні блоки: {self.counts['fb_sources']}")
+        self._log(f"  ✓ Типи даних (DDT): {self.counts['ddt_sources']}")
+        self._log(f"  ✓ Зовнішні функції (EF): {self.counts['ef_sources']}")
+        self._log(f"  ✓ DFB блоки: {self.counts['dfb_sources']}")
+        self._log(f"  ✓ Програми: {self.counts['programs']}")
+        self._log(f"  ✓ Глобальні змінні: {len(self.extracted_data['variables'])}")
+        return True
+
+    def _iter_rendered_units(self):
+        """Готові файли воркерів у порядку OUTPUT_LAYOUT, потім глобальні змінні"""
+        for key, _, _ in OUTPUT_LAYOUT:
+            for rel_path, content in self.rendered.get(key, ()):
+                yield key, None, rel_path, content
+        yield from super()._iter_rendered_units()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XEF Watch - Постійний процес, що перевитягує проект після кожного експорту
+Без повторного запуску інтерпретатора; незмінені файли не перезаписуються
+завдяки хешам у маніфесті (інкрементальне збереження)
+"""
+
+import argparse
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from xef_backends import DEFAULT_BACKEND, add_backend_argument
+from xef_batch import claim_output_dir, find_inputs, output_owner, project_names
+from xef_extractor import READ_ERRORS, XEFExtractor
+
+
+# Інтервал опитування файлів, с
+POLL_INTERVAL = 0.5
+
+# Скільки файл має залишатися незмінним, перш ніж його читати, с
+# (Control Expert пише експорт не одним записом)
+DEBOUNCE = 1.0
+
+
+class WatchedProject:
+    """Стан одного відстежуваного файлу"""
+
+    def __init__(self, path, output_dir):
+        self.path = path
+        self.output_dir = output_dir
+        self.signature = None      # (розмір, mtime) при останньому опитуванні
+        self.changed_at = 0.0      # коли сигнатура змінилася востаннє
+        self.processed = None      # сигнатура, для якої вже була екстракція
+
+
+def file_signature(path):
+    """(розмір, mtime_ns) файлу або None, якщо його немає"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ProjectWatcher:
+    """Опитує XEF/ZEF файли і каталоги та перевитягує змінені проекти
+
+    Файл обробляється, коли його розмір і mtime не змінювалися протягом
+    debounce секунд; ZEF додатково має бути цілим zip архівом. Нові
+    файли в каталогах підхоплюються при кожному опитуванні і теж чекають
+    debounce; без очікування обробляються тільки файли, що були на старті.
+    """
+
+    def __init__(self, paths, output_root='.', output_dir=None, streaming=False,
+                 backend=DEFAULT_BACKEND, only=None, debounce=DEBOUNCE, interval=POLL_INTERVAL,
+                 log=print):
+        self.paths = list(paths)
+        self.output_root = Path(output_root)
+        # Явна вихідна папка має сенс тільки для одного файлу
+        self.output_dir = output_dir
+        self.streaming = streaming
+        self.backend = backend
+        self.only = only
+        self.debounce = debounce
+        self.interval = interval
+        self.log = log
+        self.projects = {}
+        self.polls = 0
+        self.warned = set()
+
+    def _warn(self, message):
+        """Вивести попередження один раз (опитування повторюються)"""
+        if message not in self.warned:
+            self.warned.add(message)
+            self.log(f"  ✗ {message}")
+
+    def _output_dirs(self, paths):
+        """Папки результатів для нових файлів: {шлях: папка}
+
+        Імена як у xef_batch.py: папка закріплюється за файлом позначкою
+        SOURCE_MARKER, тому однакові імена файлів з різних каталогів не
+        пишуть в одну папку, а перезапуск дає ті самі папки.
+        """
+        if self.output_dir is not None:
+            return dict.fromkeys(paths, Path(self.output_dir))
+        try:
+            names = project_names(paths, output_owner(self.output_root))
+        except ValueError as e:
+            self._warn(str(e))
+            return {}
+        output_dirs = {}
+        for path, name in names.items():
+            output_dirs[path] = self.output_root / f"{name}_extracted"
+            claim_output_dir(output_dirs[path], path)
+        return output_dirs
+
+    def poll(self, now=None):
+        """Одне опитування: перевитягнути файли, що змінилися і стабілізувалися"""
+        now = time.monotonic() if now is None else now
+        current = set()
+        inputs = find_inputs(self.paths)
+        output_dirs = self._output_dirs([path for path in inputs
+                                         if path not in self.projects and path.is_file()])
+        for path in inputs:
+            current.add(path)
+            signature = file_signature(path)
+            if signature is None:
+                continue
+            project = self.projects.get(path)
+            if project is None:
+                if path not in output_dirs:
+                    continue
+                project = self.projects[path] = WatchedProject(path, output_dirs[path])
+                project.signature = signature
+                # Файли, що були на старті, обробляються одразу; нові (експорт
+                # міг ще не дописатися) чекають debounce, як і змінені
+                project.changed_at = now - self.debounce if not self.polls else now
+            if signature != project.signature:
+                project.signature = signature
+                project.changed_at = now
+                continue
+            if signature != project.processed and now - project.changed_at >= self.debounce:
+                project.processed = signature
+                self.extract(project)
+
+        # Видалені файли більше не відстежуються (результати залишаються)
+        for path in self.projects.keys() - current:
+            del self.projects[path]
+        self.polls += 1
+
+    def extract(self, project):
+        """Перевитягнути один проект (інкрементально)"""
+        path = project.path
+        if path.suffix.lower() == '.zef' and not zipfile.is_zipfile(path):
+            self.log(f"  … {path.name}: архів ще не дописано, чекаю наступної зміни")
+            return False
+
+        started = time.perf_counter()
+        try:
+            extractor = XEFExtractor(path, streaming=self.streaming, quiet=True,
+                                     backend=self.backend, only=self.only)
+            if not (extractor.parse() and extractor.extract_all()):
+                self.log(f"  ✗ {path.name}: {extractor.error}")
+                return False
+            stats = extractor.save_to_files(project.output_dir, incremental=True)
+        except READ_ERRORS as e:
+            self.log(f"  ✗ {path.name}: {e}")
+            return False
+
+        self.log(f"  ✓ {time.strftime('%H:%M:%S')} {path.name}: "
+                 f"записано {stats['written']}, без змін {stats['skipped']}, "
+                 f"видалено {stats['deleted']} ({time.perf_counter() - started:.2f} с)")
+        return True
+
+    def run(self):
+        """Опитувати до Ctrl+C"""
+        self.log(f"👀 Відстеження: {', '.join(map(str, self.paths))} (Ctrl+C - вихід)")
+        try:
+            while True:
+                self.poll()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            self.log("\n⏹ Відстеження зупинено")
+
+
+def main():
+    """Головна функція"""
+    parser = argparse.ArgumentParser(
+        description="Відстеження XEF/ZEF файлів і автоматична екстракція після змін")
+    parser.add_argument('paths', nargs='+', help="XEF/ZEF файли або каталоги з ними")
+    parser.add_argument('-o', '--output-root', default='.',
+                        help="каталог для результатів (<ім'я>_extracted у ньому)")
+    parser.add_argument('--stream', action='store_true',
+                        help="потоковий режим (iterparse) для великих файлів")
+    add_backend_argument(parser)
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE,
+                        help=f"скільки секунд файл має не змінюватися (за замовчуванням {DEBOUNCE})")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f"інтервал опитування, с (за замовчуванням {POLL_INTERVAL})")
+    args = parser.parse_args()
+
+    missing = [path for path in args.paths if not Path(path).exists()]
+    if missing:
+        print(f"✗ Не знайдено: {', '.join(missing)}")
+        sys.exit(1)
+    ProjectWatcher(args.paths, args.output_root, streaming=args.stream, backend=args.backend,
+                   debounce=args.debounce, interval=args.interval).run()
+
+
+if __name__ == '__main__':
+    main()
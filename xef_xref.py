@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XEF Cross Reference - Перехресні посилання ST коду
+Хто читає і пише яку змінну, де вона оголошена і які екземпляри FB викликаються
+"""
+
+import argparse
+import csv
+import re
+import sys
+from pathlib import Path
+
+from xef_backends import add_backend_argument
+from xef_extractor import OUTPUT_LAYOUT, UNIT_TYPES, VARIABLE_FIELDS, XEFExtractor
+
+
+XREF_CSV = 'XREF.csv'
+
+XREF_FIELDS = ('identifier', 'declared_in', 'declared_type', 'unit_type', 'unit',
+               'section', 'line', 'access')
+
+# Один прохід по тексту: кожна позиція коду належить рівно одному токену
+TOKEN_RE = re.compile(r"""
+     (?P<nl>\n)
+    |(?P<ws>[ \t\r\f\v]+)
+    |(?P<comment>\(\*.*?\*\)|/\*.*?\*/|//[^\n]*)
+    |(?P<string>'(?:\$.|[^'$])*'|"(?:\$.|[^"$])*")
+    |(?P<typed>[A-Za-z_]\w*\#[\w.:+\-#]*)
+    |(?P<number>\d[\d_]*(?:\#[0-9A-Fa-f_]+|(?:\.\d[\d_]*)?(?:[eE][+-]?\d+)?))
+    |(?P<address>%[A-Za-z]+[\d.:]*)
+    |(?P<ident>[A-Za-z_]\w*)
+    |(?P<op>:=|=>|<=|>=|<>|\*\*|.)
+""", re.S | re.X)
+
+# Ключові слова ST, що не є ідентифікаторами змінних
+KEYWORDS = frozenset((
+    'AND', 'OR', 'XOR', 'NOT', 'MOD', 'IF', 'THEN', 'ELSIF', 'ELSE', 'END_IF',
+    'CASE', 'OF', 'END_CASE', 'FOR', 'TO', 'BY', 'DO', 'END_FOR', 'WHILE',
+    'END_WHILE', 'REPEAT', 'UNTIL', 'END_REPEAT', 'EXIT', 'RETURN', 'TRUE', 'FALSE',
+))
+
+# Після цих токенів починається новий оператор (можливе присвоєння)
+STATEMENT_STARTS = frozenset((
+    ';', ':', 'THEN', 'ELSE', 'DO', 'REPEAT', 'FOR', 'END_IF', 'END_CASE',
+    'END_FOR', 'END_WHILE', 'END_REPEAT',
+))
+
+
+def tokenize_st(code):
+    """Токени ST коду: (вид, значення, рядок); пробіли і коментарі пропускаються"""
+    line = 1
+    for match in TOKEN_RE.finditer(code):
+        kind = match.lastgroup
+        if kind == 'nl':
+            line += 1
+        elif kind == 'ws':
+            pass
+        elif kind == 'comment' or kind == 'string':
+            value = match.group()
+            if kind == 'string':
+                yield kind, value, line
+            line += value.count('\n')
+        else:
+            yield kind, match.group(), line
+
+
+def scan_st(code):
+    """Використання ідентифікаторів у ST коді: (ідентифікатор, рядок, доступ)
+
+    Доступ: 'write' - ціль присвоєння або вихід виклику (=>), 'call' -
+    виклик функції чи екземпляра FB, 'read' - решта. Для x.y[i] враховується
+    тільки базова змінна x; імена формальних параметрів виклику (IN := ...)
+    пропускаються. Один лінійний прохід з переглядом на токен вперед.
+    """
+    tokens = list(tokenize_st(code))
+    usages = []
+    # Дужки: True - список аргументів виклику, False - вираз або індекс
+    brackets = []
+    statement_start = True
+    target = None          # індекс кандидата в цілі присвоєння в usages
+    output_target = False  # наступний ідентифікатор - вихід виклику (=>)
+    count = len(tokens)
+    for i, (kind, value, line) in enumerate(tokens):
+        if kind != 'ident':
+            if kind == 'op':
+                if value == ':=' and not brackets and target is not None:
+                    name, target_line, _ = usages[target]
+                    usages[target] = (name, target_line, 'write')
+                elif value == '=>':
+                    output_target = True
+                elif value == '(':
+                    brackets.append(i > 0 and tokens[i - 1][0] == 'ident'
+                                    and tokens[i - 1][1].upper() not in KEYWORDS)
+                elif value == '[':
+                    brackets.append(False)
+                elif value in (')', ']') and brackets:
+                    brackets.pop()
+                if value in STATEMENT_STARTS and not brackets:
+                    statement_start = True
+                    target = None
+                    continue
+            statement_start = False
+            continue
+
+        upper = value.upper()
+        if upper in KEYWORDS:
+            statement_start = upper in STATEMENT_STARTS
+            target = None
+            continue
+        previous = tokens[i - 1][1] if i else None
+        following = tokens[i + 1][1] if i + 1 < count else None
+        if previous == '.':
+            # Поле структури або FB: x.y - використання x
+            continue
+        if brackets and brackets[-1] and previous in ('(', ',') and following in (':=', '=>'):
+            # Ім'я формального параметра виклику
+            continue
+
+        if following == '(':
+            access = 'call'
+        elif output_target:
+            access = 'write'
+            output_target = False
+        else:
+            access = 'read'
+        if statement_start and not brackets and access == 'read':
+            target = len(usages)
+        statement_start = False
+        usages.append((value, line, access))
+    return usages
+
+
+class CrossReference:
+    """Перехресні посилання по витягнутих даних проекту
+
+    Оголошення беруться зі списків змінних юнітів і глобальних змінних;
+    ідентифікатор шукається спочатку серед локальних змінних юніта, потім
+    серед глобальних, потім серед імен юнітів (виклики функцій і FB).
+    ST нечутливий до регістру, тому порівняння виконується у верхньому регістрі.
+    """
+
+    def __init__(self, extracted_data):
+        self.data = extracted_data
+        # ім'я -> (де оголошено, тип)
+        self.globals = {}
+        table = extracted_data['variables']
+        for name, type_name in zip(table.names, table.types):
+            if name:
+                self.globals[name.upper()] = ('dataBlock', type_name)
+        self.units = {}
+        for key, _, _ in OUTPUT_LAYOUT:
+            if key == 'programs':
+                continue
+            for unit in extracted_data[key]:
+                if unit.name:
+                    self.units[unit.name.upper()] = (f"{UNIT_TYPES[key]}:{unit.name}", UNIT_TYPES[key])
+
+    def _locals(self, unit_type, unit):
+        """Локальні оголошення юніта: ім'я -> (де оголошено, тип)"""
+        declared_in = f"{unit_type}:{unit.name}"
+        declarations = {}
+        for field in VARIABLE_FIELDS:
+            for var in getattr(unit, field, None) or ():
+                if var.name:
+                    declarations[var.name.upper()] = (declared_in, var.type)
+        return declarations
+
+    def _code_sections(self):
+        """(тип юніта, юніт, секція, ST код) для всіх ST тіл проекту"""
+        for key, _, _ in OUTPUT_LAYOUT:
+            unit_type = UNIT_TYPES[key]
+            for unit in self.data[key]:
+                if key == 'fb_sources':
+                    for section in unit.programs:
+                        if section.language == 'ST' and section.code:
+                            yield unit_type, unit, section.name, section.code
+                elif getattr(unit, 'code', None) and unit.language == 'ST':
+                    yield unit_type, unit, unit.name, unit.code
+
+    def iter_rows(self):
+        """Рядки таблиці XREF_FIELDS у порядку юнітів і рядків коду"""
+        for unit_type, unit, section, code in self._code_sections():
+            local = self._locals(unit_type, unit)
+            for identifier, line, access in scan_st(code):
+                upper = identifier.upper()
+                declared_in, declared_type = (local.get(upper) or self.globals.get(upper)
+                                              or self.units.get(upper) or ('', ''))
+                yield (identifier, declared_in, declared_type, unit_type, unit.name,
+                       section, line, access)
+
+    def iter_instance_calls(self):
+        """Виклики екземплярів FB (змінних), без викликів функцій за іменем юніта"""
+        unit_tags = set(UNIT_TYPES.values())
+        for row in self.iter_rows():
+            if row[7] == 'call' and row[2] and row[2] not in unit_tags:
+                yield row
+
+    def write_csv(self, path):
+        """Записати таблицю у CSV, повернути кількість рядків"""
+        count = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(XREF_FIELDS)
+            for row in self.iter_rows():
+                writer.writerow(row)
+                count += 1
+        return count
+
+
+def write_xref(extractor, output_dir):
+    """Записати XREF_CSV поруч з деревом екстракції, повернути кількість рядків"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return CrossReference(extractor.extracted_data).write_csv(output_dir / XREF_CSV)
+
+
+def main():
+    """Головна функція"""
+    parser = argparse.ArgumentParser(
+        description="Перехресні посилання ST коду XEF/ZEF проекту")
+    parser.add_argument('xef_file', help="шлях до XEF файлу або архіву ZEF")
+    parser.add_argument('-o', '--output', default=XREF_CSV,
+                        help=f"CSV файл (за замовчуванням {XREF_CSV}, '-' - stdout)")
+    parser.add_argument('--calls', action='store_true',
+                        help="тільки виклики екземплярів FB/DFB")
+    parser.add_argument('--stream', action='store_true',
+                        help="потоковий режим (iterparse) для великих файлів")
+    add_backend_argument(parser)
+    args = parser.parse_args()
+
+    extractor = XEFExtractor(args.xef_file, streaming=args.stream, quiet=True,
+                             backend=args.backend)
+    if not (extractor.parse() and extractor.extract_all()):
+        print(f"✗ Помилка читання файлу: {extractor.error}", file=sys.stderr)
+        sys.exit(1)
+
+    xref = CrossReference(extractor.extracted_data)
+    rows = xref.iter_instance_calls() if args.calls else xref.iter_rows()
+    f = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        writer = csv.writer(f)
+        writer.writerow(XREF_FIELDS)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    except BrokenPipeError:
+        # Споживач stdout (наприклад | head) закрив канал
+        sys.stdout = None
+        return
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    if args.output != '-':
+        print(f"✅ Посилань: {count} → {args.output}")
+
+
+if __name__ == '__main__':
+    main()